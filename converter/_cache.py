@@ -0,0 +1,99 @@
+"""Cache em disco de textos extraídos, indexado pelo conteúdo do arquivo.
+
+Usado por `file_utils` para que execuções repetidas (ex.: acrescentar um
+arquivo e converter de novo) não reextraiam nem refaçam o OCR dos arquivos que
+não mudaram. Cada entrada é um arquivo `<sha1>_<opções>.cache` (texto UTF-8)
+no diretório do cache, gravado de forma atômica, então os processos do pool
+podem compartilhar o mesmo diretório sem coordenação. A extensão não é de
+entrada suportada, para que o cache nunca seja coletado como documento.
+
+O cache é limitado a `_MAX_BYTES`: `prune` (chamada ao fim de cada extração
+em lote) remove as entradas usadas há mais tempo; cada leitura atualiza o
+mtime da entrada.
+"""
+from pathlib import Path
+from typing import Optional
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Tamanho dos blocos lidos ao calcular o hash do arquivo
+_HASH_CHUNK = 1 << 20
+_SUFFIX = ".cache"
+# Tamanho máximo do diretório do cache
+_MAX_BYTES = 256 * 1024 * 1024
+
+
+def key(path: str, use_ocr: bool, clean_special_chars: bool, auto_ocr: bool = False) -> str:
+    """Chave do texto de `path`: SHA-1 do conteúdo + opções de extração.
+
+    Raises:
+        OSError: Se o arquivo não puder ser lido
+    """
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return f"{h.hexdigest()}_{int(use_ocr)}{int(clean_special_chars)}{int(auto_ocr)}"
+
+
+def get(cache_dir: Path, key: str) -> Optional[str]:
+    """Texto guardado para `key`, ou None se não houver (ou não puder ser lido)."""
+    path = Path(cache_dir) / f"{key}{_SUFFIX}"
+    try:
+        # Bytes, e não read_text: quebras de linha voltam exatamente como foram gravadas
+        text = path.read_bytes().decode("utf-8")
+    except FileNotFoundError:
+        return None
+    except (OSError, UnicodeDecodeError) as e:
+        logger.warning(f"Entrada de cache ilegível {key}: {e}")
+        return None
+    try:
+        os.utime(path)  # entrada recém-usada: última a sair em prune
+    except OSError:
+        pass
+    return text
+
+
+def put(cache_dir: Path, key: str, text: str) -> None:
+    """Guarda `text` para `key`. Falhas só geram aviso: o cache é opcional."""
+    cache_dir = Path(cache_dir)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_dir / f"{key}.{os.getpid()}.tmp"
+        tmp_path.write_bytes(text.encode("utf-8"))
+        os.replace(tmp_path, cache_dir / f"{key}{_SUFFIX}")
+    except (OSError, UnicodeEncodeError) as e:
+        logger.warning(f"Falha ao gravar cache de texto em {cache_dir}: {e}")
+
+
+def prune(cache_dir: Path, max_bytes: int = _MAX_BYTES) -> None:
+    """Remove as entradas usadas há mais tempo até o cache caber em `max_bytes`."""
+    try:
+        with os.scandir(cache_dir) as it:
+            entries = []
+            for e in it:
+                if e.name.endswith(_SUFFIX):
+                    st = e.stat()
+                    entries.append((st.st_mtime_ns, st.st_size, e.path))
+    except FileNotFoundError:
+        return
+    except OSError as e:
+        logger.warning(f"Falha ao listar cache de texto em {cache_dir}: {e}")
+        return
+
+    total = sum(size for _, size, _ in entries)
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Falha ao remover entrada de cache {path}: {e}")
+            continue
+        total -= size
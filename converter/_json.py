@@ -0,0 +1,48 @@
+"""Serialização JSON usando orjson quando disponível.
+
+orjson (opcional) codifica e decodifica várias vezes mais rápido que o módulo
+`json` da biblioteca padrão e já trabalha com bytes UTF-8, evitando o passo
+extra de `.encode("utf-8")`. Sem orjson, as mesmas funções usam `json` com
+saída equivalente (UTF-8 sem escapes ASCII).
+"""
+import codecs
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """Serializa `obj` para bytes UTF-8.
+
+    Args:
+        obj: Objeto a serializar
+        pretty: Se True, indenta com 2 espaços; caso contrário usa saída compacta
+
+    Returns:
+        JSON codificado em UTF-8
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, option=option)
+        except TypeError:
+            # Tipos não suportados pelo orjson: usar a biblioteca padrão
+            pass
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Desserializa JSON a partir de bytes ou str (ignora BOM UTF-8 inicial)."""
+    if isinstance(data, bytes) and data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
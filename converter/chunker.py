@@ -5,41 +5,168 @@ gerar chunks por tamanho aproximado (medido em bytes ao serializar em UTF-8)
 e escrever arquivos JSON sequenciais.
 
 Otimizações:
-- Estimativa rápida de bytes sem serialização completa
+- Estimativa de bytes por contagem estrutural (sem serializar documentos)
 - Divisão eficiente de documentos grandes
+- Escrita incremental: cada documento vai para o arquivo assim que entra no batch
 - Tratamento robusto de erros
 """
 from pathlib import Path
 import json
+import re
 import uuid
+from collections import Counter, defaultdict
 from datetime import datetime
 from typing import Iterable, Dict, Any, List
 import logging
 
+from . import _json
+
 logger = logging.getLogger(__name__)
 
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+_DOC_META_KEYS = ("source_path", "filename", "filetype", "id")
+_DOC_KEYS = _DOC_META_KEYS + ("chunk_index", "text", "char_count")
+
+# Saída compacta (sem indentação); `pretty=True` em chunk_and_write para depuração
+_JSON_SEPARATORS = (",", ":")
+# Buffer de escrita dos arquivos gerados (batches aqui, MRD em output_formats)
+WRITE_BUFFER_BYTES = 1 << 20
+
+# Bytes fixos (chaves + pontuação) de um documento e de um batch vazio.
+# UUIDs têm tamanho fixo e o timestamp usa o formato mais longo possível.
+_DOC_SKELETON_BYTES = len(json.dumps(dict.fromkeys(_DOC_KEYS, 0), separators=_JSON_SEPARATORS)) - len(_DOC_KEYS)
+_BATCH_OVERHEAD_BYTES = len(json.dumps({
+    "batch_id": "0" * 36,
+    "created_at": "2000-01-01T00:00:00.000000Z",
+    "documents": [],
+}, separators=_JSON_SEPARATORS))
+_LIST_SEPARATOR_BYTES = len(_JSON_SEPARATORS[0])
 
-def _estimate_bytes(obj: Any) -> int:
-    """Estima o tamanho em bytes de um objeto JSON.
 
-    Usa serialização completa para garantir precisão.
-    Para objetos grandes, isso pode ser otimizado com estimativas.
+# Caracteres que o JSON escapa: aspas, barra invertida e \b \t \n \f \r viram
+# escapes de 2 bytes; os demais caracteres de controle (C0) viram \u00XX (6 bytes)
+_ESCAPED_CHARS = '"\\\b\t\n\f\r'
+_ESCAPED_BYTES = _ESCAPED_CHARS.encode("ascii")
+_CONTROL_RE = re.compile("[\x00-\x07\x0b\x0e-\x1f]")
+_CONTROL_BYTES_RE = re.compile(b"[\x00-\x07\x0b\x0e-\x1f]")
+_CONTROL_EXTRA_BYTES = 5
+# Limite superior de bytes por caractere no JSON (UTF-8 usa até 4 bytes; um
+# caractere de controle escapado como \u00XX ocupa 6)
+_MAX_BYTES_PER_CHAR = 6
+# Menor orçamento de texto por chunk ao dividir documentos grandes
+_MIN_CHUNK_TEXT_BYTES = 256
+
+
+def _escape_extra(value) -> int:
+    """Bytes a mais que os escapes ocupam no JSON (str ou bytes UTF-8).
+
+    Cada escape curto soma 1 byte ao caractere original; cada \\u00XX, 5.
     """
+    if isinstance(value, bytes):
+        chars, control_re = _ESCAPED_BYTES, _CONTROL_BYTES_RE
+    else:
+        chars, control_re = _ESCAPED_CHARS, _CONTROL_RE
+    return (sum(value.count(c) for c in chars)
+            + _CONTROL_EXTRA_BYTES * len(control_re.findall(value)))
+
+
+def _utf8_boundary(data: bytes, pos: int) -> int:
+    """Recua `pos` até o início de um caractere UTF-8 (nunca corta um code point)."""
+    while 0 < pos < len(data) and (data[pos] & 0xC0) == 0x80:
+        pos -= 1
+    return pos
+
+
+def _json_value_bytes(value: Any) -> int:
+    """Calcula o tamanho em bytes de um valor escalar serializado em JSON (UTF-8).
+
+    Strings ASCII usam `len()` direto (sem codificar); as demais são codificadas
+    uma única vez. Soma as aspas e os escapes (ver `_escape_extra`): 2 bytes
+    para \\n, \\r, \\t, \\b, \\f, \\" e \\\\, 6 para os demais caracteres de controle.
+    """
+    if value is None:
+        return 4
+    if isinstance(value, bool):
+        return 4 if value else 5
+    if isinstance(value, int):
+        return len(str(value))
+    if isinstance(value, str):
+        size = len(value) if value.isascii() else len(value.encode("utf-8"))
+        return size + 2 + _escape_extra(value)
     try:
-        return len(json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+        return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
     except Exception as e:
-        logger.error(f"Erro ao estimar bytes do objeto: {e}")
+        logger.error(f"Erro ao estimar bytes do valor: {e}")
         # Estimativa conservadora
-        return len(str(obj).encode("utf-8")) * 2
+        return len(str(value).encode("utf-8")) * 2
+
 
+def _estimate_doc_bytes(meta_bytes: int, text_bytes: int, chunk_index: int, char_count: int) -> int:
+    """Estima o tamanho em bytes de um documento no JSON sem serializá-lo.
+
+    Args:
+        meta_bytes: Bytes já calculados dos valores de metadata (source_path, filename, filetype, id)
+        text_bytes: Bytes do campo `text` serializado (ver `_json_value_bytes`)
+        chunk_index: Índice do chunk
+        char_count: Número de caracteres do chunk
 
-def chunk_and_write(documents: Iterable[Dict[str, Any]], out_dir: Path, max_size_bytes: int, embed_index: bool = False) -> List[str]:
+    Returns:
+        Tamanho estimado, incluindo o separador da lista de documentos
+    """
+    return (_DOC_SKELETON_BYTES + _LIST_SEPARATOR_BYTES + meta_bytes + text_bytes
+            + len(str(chunk_index)) + len(str(char_count)))
+
+
+def _index_document(refs: List[Dict[str, Any]], postings: Dict[str, List[List[int]]], doc: Dict[str, Any]) -> None:
+    """Acrescenta `doc` (na posição len(refs) do batch) ao índice local em construção."""
+    pos = len(refs)
+    text = doc.get("text", "") or ""
+    refs.append({
+        "doc_pos": pos,
+        "chunk_index": doc.get("chunk_index", 0),
+        "filename": doc.get("filename"),
+        "char_count": doc.get("char_count", len(text)),
+    })
+    for term, freq in Counter(_TOKEN_RE.findall(text.lower())).items():
+        postings[term].append([pos, freq])
+
+
+def build_local_index(documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Constrói o índice local de um batch (também usado no formato MRD).
+
+    Formato: ``{"refs": [ref, ...], "postings": {termo: [[pos_ref, ocorrências], ...]}}``.
+    Cada referência (doc_pos, chunk_index, filename, char_count) é gravada
+    uma única vez em `refs`; as postings guardam só pares de inteiros.
+    """
+    refs: List[Dict[str, Any]] = []
+    postings: Dict[str, List[List[int]]] = defaultdict(list)
+    for d in documents:
+        _index_document(refs, postings, d)
+
+    return {"refs": refs, "postings": dict(postings)}
+
+
+def _nest(data: bytes, levels: int) -> bytes:
+    """Reindenta JSON indentado (2 espaços) para aninhá-lo `levels` níveis abaixo.
+
+    Strings JSON nunca contêm quebras de linha literais, então toda quebra é de formatação.
+    """
+    return data.replace(b"\n", b"\n" + b"  " * levels)
+
+
+def chunk_and_write(documents: Iterable[Dict[str, Any]], out_dir: Path, max_size_bytes: int, embed_index: bool = False,
+                    pretty: bool = False) -> List[str]:
     """Agrupa documentos em arquivos JSON respeitando limite de tamanho.
 
     Args:
         documents: Iterável de dicionários com documentos processados
         out_dir: Diretório de saída para os arquivos JSON
         max_size_bytes: Tamanho máximo em bytes por arquivo JSON
+        embed_index: Se True, inclui um índice local (termo -> referências) em cada batch
+        pretty: Se True, grava JSON indentado (depuração). A estimativa de tamanho
+            considera a saída compacta, então arquivos indentados podem exceder o limite.
 
     Returns:
         Lista com caminhos dos arquivos JSON criados
@@ -58,138 +185,188 @@ def chunk_and_write(documents: Iterable[Dict[str, Any]], out_dir: Path, max_size
         logger.error(f"Erro ao criar diretório de saída {out_dir}: {e}")
         raise
 
-    batch = {
-        "batch_id": str(uuid.uuid4()),
-        "created_at": datetime.utcnow().isoformat() + "Z",
-        "documents": [],
-    }
-    current_size = _estimate_bytes(batch)  # base overhead
+    # Cada documento é gravado no arquivo do batch assim que entra nele: só o
+    # documento atual fica em memória, e o índice local (se pedido) é montado
+    # incrementalmente. O arquivo final é idêntico ao de um json.dumps do batch.
+    if pretty:
+        first_sep, doc_sep = b"\n    ", b",\n    "
+        docs_end, index_key, batch_end = b"\n  ]", b',\n  "local_index": ', b"\n}"
+    else:
+        first_sep, doc_sep = b"", b","
+        docs_end, index_key, batch_end = b"]", b',"local_index":', b"}"
+
+    out_file = None
+    out_path = None
+    batch_docs = 0
+    refs: List[Dict[str, Any]] = []
+    postings: Dict[str, List[List[int]]] = defaultdict(list)
+    current_size = _BATCH_OVERHEAD_BYTES
+    # Textos do batch contabilizados em current_size pelo limite superior
+    # (ainda sem tamanho exato); ver reconcile_pending
+    pending_texts: List[str] = []
     file_index = 1
     created_files = []
 
-    def flush_current():
-        """Escreve o batch atual em arquivo e reseta para novo batch."""
-        nonlocal batch, current_size, file_index, created_files
-        if not batch["documents"]:
-            return
+    def reconcile_pending():
+        """Troca o limite superior dos textos pendentes pelo tamanho exato."""
+        nonlocal current_size
+        for text in pending_texts:
+            current_size -= _MAX_BYTES_PER_CHAR * len(text) + 2 - _json_value_bytes(text)
+        pending_texts.clear()
 
-        # Gerar nome mais descritivo baseado no primeiro documento do batch
-        first_doc = batch["documents"][0]
+    def open_batch(first_doc: Dict[str, Any]):
+        """Cria o arquivo do batch (nome baseado no primeiro documento) e grava o início."""
+        nonlocal out_file, out_path
         doc_name = first_doc.get("filename", "documento")
         # Remover extensão e caracteres problemáticos
         doc_name = Path(doc_name).stem
         doc_name = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in doc_name)
         doc_name = doc_name[:50]  # Limitar tamanho
-        
+
         # Formato: batch_XXXX_nome-do-documento.json
         out_path = out_dir / f"batch_{file_index:04d}_{doc_name}.json"
+        header = _json.dumps({
+            "batch_id": str(uuid.uuid4()),
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "documents": [],
+        }, pretty=pretty)
+        out_file = open(out_path, "wb", buffering=WRITE_BUFFER_BYTES)
+        # Cabeçalho até o "[" da lista de documentos
+        out_file.write(header[:header.rindex(b"[") + 1])
+
+    def add_doc(doc: Dict[str, Any]):
+        """Grava um documento no batch atual."""
+        nonlocal batch_docs
         try:
-            # Se solicitado, construir índice local para o batch antes de salvar
-            if embed_index and batch.get("documents"):
-                try:
-                    # índice simples: termo -> lista de refs
-                    from collections import defaultdict
-                    import re
-                    token_re = re.compile(r"\w+", re.UNICODE)
-                    postings = defaultdict(list)
-                    for pos, d in enumerate(batch.get("documents", [])):
-                        text = d.get("text", "") or ""
-                        tokens = token_re.findall(text.lower())
-                        if not tokens:
-                            continue
-                        counts = {}
-                        for t in tokens:
-                            counts[t] = counts.get(t, 0) + 1
-                        ref = {
-                            "doc_pos": pos,
-                            "chunk_index": d.get("chunk_index", 0),
-                            "filename": d.get("filename"),
-                            "char_count": d.get("char_count", len(text)),
-                        }
-                        for term, freq in counts.items():
-                            entry = dict(ref)
-                            entry["occurrences"] = freq
-                            postings[term].append(entry)
-                    batch["local_index"] = {k: v for k, v in postings.items()}
-                except Exception:
-                    logger.exception("Falha ao construir índice local para batch")
-
-            with open(out_path, "w", encoding="utf-8") as f:
-                json.dump(batch, f, ensure_ascii=False, indent=2)
+            if out_file is None:
+                open_batch(doc)
+            data = _json.dumps(doc, pretty=pretty)
+            out_file.write(doc_sep if batch_docs else first_sep)
+            out_file.write(_nest(data, 2) if pretty else data)
+        except Exception as e:
+            logger.error(f"Erro ao escrever arquivo {out_path}: {e}")
+            raise
+        batch_docs += 1
+        if embed_index:
+            _index_document(refs, postings, doc)
+
+    def flush_current():
+        """Fecha o batch atual (índice local e fim do JSON) e reseta para novo batch."""
+        nonlocal out_file, batch_docs, current_size, file_index
+        if out_file is None:
+            return
+
+        try:
+            with out_file:
+                out_file.write(docs_end)
+                if embed_index:
+                    local_index = _json.dumps({"refs": refs, "postings": postings}, pretty=pretty)
+                    out_file.write(index_key)
+                    out_file.write(_nest(local_index, 1) if pretty else local_index)
+                out_file.write(batch_end)
             created_files.append(str(out_path))
-            logger.info(f"Arquivo JSON criado: {out_path} ({len(batch['documents'])} documentos)")
+            logger.info(f"Arquivo JSON criado: {out_path} ({batch_docs} documentos)")
             file_index += 1
         except Exception as e:
             logger.error(f"Erro ao escrever arquivo {out_path}: {e}")
             raise
+        finally:
+            out_file = None
 
-        # Reset para novo batch
-        batch = {
-            "batch_id": str(uuid.uuid4()),
-            "created_at": datetime.utcnow().isoformat() + "Z",
-            "documents": [],
-        }
-        current_size = _estimate_bytes(batch)
+        batch_docs = 0
+        refs.clear()
+        postings.clear()
+        pending_texts.clear()
+        current_size = _BATCH_OVERHEAD_BYTES
 
     doc_count = 0
-    for doc in documents:
-        doc_count += 1
-        # Cada doc pode ser grande; se um único doc > max_size_bytes, dividir em chunks menores
-        doc_text = doc.get("text", "") or ""
-
-        # Preparar metadata base
-        base_meta = {k: doc.get(k) for k in ("source_path", "filename", "filetype")}
-
-        # Adicionar ID único ao documento se não existir
-        if "id" not in base_meta:
-            base_meta["id"] = str(uuid.uuid4())
-
-        # Se pequeno o suficiente para adicionar como está
-        candidate = {**base_meta, "chunk_index": 0, "text": doc_text, "char_count": len(doc_text)}
-        candidate_size = _estimate_bytes(candidate)
-
-        if candidate_size > max_size_bytes:
-            # Dividir documento grande em chunks menores
-            logger.info(f"Documento {base_meta.get('filename', 'unknown')} é muito grande ({candidate_size} bytes), dividindo...")
-
-            # Calcular tamanho aproximado por chunk
-            approx_chars_per_chunk = max(1024, int(len(doc_text) * (max_size_bytes / max(candidate_size, 1))))
-            idx = 0
-            start = 0
-
-            while start < len(doc_text):
-                part = doc_text[start:start + approx_chars_per_chunk]
-                candidate = {**base_meta, "chunk_index": idx, "text": part, "char_count": len(part)}
-                cand_size = _estimate_bytes(candidate)
-
-                # Se ainda muito grande, reduzir pela metade iterativamente
-                shrink_attempts = 0
-                while cand_size > max_size_bytes and len(part) > 100 and shrink_attempts < 10:
-                    part = part[:len(part)//2]
-                    candidate = {**base_meta, "chunk_index": idx, "text": part, "char_count": len(part)}
-                    cand_size = _estimate_bytes(candidate)
-                    shrink_attempts += 1
-
-                if cand_size > max_size_bytes:
-                    logger.warning(f"Chunk ainda muito grande após {shrink_attempts} tentativas. Usando mesmo assim.")
-
-                # Verificar se adicionar cabe no JSON atual
-                if current_size + cand_size > max_size_bytes and batch["documents"]:
+    try:
+        for doc in documents:
+            doc_count += 1
+            # Cada doc pode ser grande; se um único doc > max_size_bytes, dividir em chunks menores
+            doc_text = doc.get("text", "") or ""
+
+            # Preparar metadata base
+            base_meta = {k: doc.get(k) for k in ("source_path", "filename", "filetype")}
+
+            # Adicionar ID único ao documento se não existir
+            if "id" not in base_meta:
+                base_meta["id"] = str(uuid.uuid4())
+
+            # Tamanho dos metadados e do texto calculado uma única vez por documento
+            meta_bytes = sum(_json_value_bytes(base_meta[k]) for k in _DOC_META_KEYS)
+
+            # Caminho rápido: se o documento cabe no batch atual mesmo no pior caso,
+            # não é preciso medir o texto agora. O tamanho exato só é calculado
+            # (reconcile_pending) quando o limite superior não basta para decidir,
+            # então os batches gerados são os mesmos da medição exata.
+            upper_size = _estimate_doc_bytes(meta_bytes, _MAX_BYTES_PER_CHAR * len(doc_text) + 2, 0, len(doc_text))
+            if current_size + upper_size <= max_size_bytes:
+                add_doc({**base_meta, "chunk_index": 0, "text": doc_text, "char_count": len(doc_text)})
+                current_size += upper_size
+                pending_texts.append(doc_text)
+                continue
+            reconcile_pending()
+
+            text_bytes = _json_value_bytes(doc_text)
+            candidate_size = _estimate_doc_bytes(meta_bytes, text_bytes, 0, len(doc_text))
+
+            if candidate_size > max_size_bytes - _BATCH_OVERHEAD_BYTES:
+                # Dividir documento que não cabe sozinho em um batch em chunks menores
+                logger.info(f"Documento {base_meta.get('filename', 'unknown')} é muito grande ({candidate_size} bytes), dividindo...")
+
+                # Dividir direto no espaço de bytes UTF-8: cada chunk recebe o orçamento
+                # de bytes que sobra após metadados e overhead do batch, cortado em
+                # fronteira de caractere. char_count é limitado por max_size_bytes.
+                raw = doc_text.encode("utf-8")
+                idx = 0
+                start = 0
+
+                while start < len(raw):
+                    overhead = _estimate_doc_bytes(meta_bytes, 2, idx, max_size_bytes) + _BATCH_OVERHEAD_BYTES
+                    budget = max(max_size_bytes - overhead, _MIN_CHUNK_TEXT_BYTES)
+                    end = _utf8_boundary(raw, min(start + budget, len(raw)))
+                    chunk = raw[start:end]
+                    escapes = _escape_extra(chunk)
+
+                    # Um único ajuste basta: cada byte removido tira pelo menos
+                    # um byte do JSON. Um sexto do orçamento sempre cabe (no
+                    # pior caso tudo é caractere de controle, 6 bytes cada).
+                    excess = len(chunk) + escapes - budget
+                    if excess > 0:
+                        end = _utf8_boundary(raw, start + max(len(chunk) - excess, budget // _MAX_BYTES_PER_CHAR))
+                        chunk = raw[start:end]
+                        escapes = _escape_extra(chunk)
+
+                    part = chunk.decode("utf-8")
+                    cand_size = _estimate_doc_bytes(meta_bytes, len(chunk) + 2 + escapes, idx, len(part))
+
+                    if cand_size > max_size_bytes:
+                        logger.warning(f"Chunk {idx} de {base_meta.get('filename', 'unknown')} excede o limite ({cand_size} bytes). Usando mesmo assim.")
+
+                    # Verificar se adicionar cabe no JSON atual
+                    if current_size + cand_size > max_size_bytes and batch_docs:
+                        flush_current()
+
+                    add_doc({**base_meta, "chunk_index": idx, "text": part, "char_count": len(part)})
+                    current_size += cand_size
+                    idx += 1
+                    start = end
+            else:
+                # Cabe como chunk único
+                if current_size + candidate_size > max_size_bytes and batch_docs:
                     flush_current()
+                add_doc({**base_meta, "chunk_index": 0, "text": doc_text, "char_count": len(doc_text)})
+                current_size += candidate_size
 
-                batch["documents"].append(candidate)
-                current_size += cand_size
-                idx += 1
-                start += len(part)
-        else:
-            # Cabe como chunk único
-            if current_size + candidate_size > max_size_bytes and batch["documents"]:
-                flush_current()
-            batch["documents"].append(candidate)
-            current_size += candidate_size
-
-    # Flush final para escrever documentos restantes
-    flush_current()
+        # Flush final para escrever documentos restantes
+        flush_current()
+    except BaseException:
+        # Não deixar um batch incompleto (JSON inválido) no diretório de saída
+        if out_file is not None:
+            out_file.close()
+            out_path.unlink(missing_ok=True)
+        raise
 
     logger.info(f"Processamento concluído: {doc_count} documentos em {len(created_files)} arquivo(s) JSON")
     return created_files
@@ -0,0 +1,327 @@
+"""Coleta de arquivos de entrada e extração de texto em lote.
+
+Usado pela CLI (main_cli.py) e pela GUI (main_enhanced.py):
+- iter_files(inputs, recursive): expande arquivos/pastas em caminhos suportados
+- collect_files(inputs, recursive): mesma coisa, retornando uma lista
+- iter_docs(candidates, ...): extrai o texto de cada arquivo e gera os documentos
+  consumidos por `chunker.chunk_and_write`, um a um, na ordem de entrada
+- process_files_to_docs(candidates, ...): mesma coisa, retornando uma lista
+
+A extração (PDF/OCR) é CPU-bound e independente por arquivo, então roda em um
+ProcessPoolExecutor quando há arquivos suficientes para compensar o custo de
+iniciar os processos.
+"""
+from collections import deque
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional
+import logging
+import os
+import stat
+
+from . import _cache, ocr, reader
+
+logger = logging.getLogger(__name__)
+
+# Abaixo deste número de arquivos a extração é feita em série
+_MIN_FILES_FOR_POOL = 3
+
+# Subpasta da saída usada pela CLI e pela GUI para o cache de textos extraídos
+EXTRACT_CACHE_DIR = ".extract_cache"
+
+# Tarefas em andamento por processo do pool: limita quantos textos extraídos
+# ficam na memória esperando a vez de serem consumidos
+_IN_FLIGHT_PER_WORKER = 4
+
+# Arquivos pequenos (exceto PDF, que pode ir para OCR) consecutivos são enviados
+# juntos ao pool, até este número por tarefa: a extração deles custa menos que
+# a ida e volta de uma tarefa entre processos
+_SMALL_FILE_BYTES = 256 * 1024
+_SMALL_FILES_PER_TASK = 32
+
+
+def _walk(root: str, recursive: bool, exts: Optional[FrozenSet[str]] = None) -> Iterator[str]:
+    """Percorre `root` com os.scandir, gerando caminhos de arquivos.
+
+    DirEntry guarda o tipo lido do diretório, então `is_dir`/`is_file` não
+    fazem stat extra na maioria dos sistemas. Links simbólicos para pastas não
+    são seguidos (mesmo comportamento de Path.rglob). Se `exts` for informado,
+    o nome é filtrado pela extensão antes de qualquer outra verificação.
+    """
+    subdirs = []
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif exts is not None and os.path.splitext(entry.name)[1].lower() not in exts:
+                    continue
+                elif entry.is_file():
+                    yield entry.path
+    except OSError as e:
+        logger.warning(f"Não foi possível listar {root}: {e}")
+        return
+    if recursive:
+        for d in subdirs:
+            yield from _walk(d, recursive, exts)
+
+
+def iter_files(inputs: Iterable[str], recursive: bool,
+               exts: Optional[FrozenSet[str]] = None) -> Iterator[str]:
+    """Expande arquivos e pastas de entrada, gerando os arquivos suportados aos poucos.
+
+    Args:
+        inputs: Caminhos de arquivos ou pastas
+        recursive: Se True, percorre subpastas
+        exts: Extensões aceitas (minúsculas, com ponto); padrão:
+            `reader.SUPPORTED_EXTS`
+
+    Yields:
+        Caminhos (str) de arquivos com extensão aceita, na ordem da varredura
+    """
+    if exts is None:
+        exts = reader.SUPPORTED_EXTS
+    for p in inputs:
+        p = str(Path(p))
+        # Um stat por entrada (is_dir + is_file fariam dois)
+        try:
+            mode = os.stat(p).st_mode
+        except (OSError, ValueError):
+            continue
+        if stat.S_ISDIR(mode):
+            yield from _walk(p, recursive, exts)
+        elif stat.S_ISREG(mode) and os.path.splitext(p)[1].lower() in exts:
+            yield p
+
+
+def collect_files(inputs: Iterable[str], recursive: bool) -> List[str]:
+    """Expande arquivos e pastas de entrada em uma lista de arquivos suportados.
+
+    Mesma varredura de `iter_files`, materializada: `iter_docs` precisa do
+    total para o progresso e para dimensionar o pool.
+
+    Args:
+        inputs: Caminhos de arquivos ou pastas
+        recursive: Se True, percorre subpastas
+
+    Returns:
+        Lista de caminhos (str) de arquivos com extensão suportada
+    """
+    return list(iter_files(inputs, recursive))
+
+
+def _prefetch(path: str) -> None:
+    """Pede ao kernel que comece a ler `path` para o cache de páginas.
+
+    posix_fadvise(WILLNEED) inicia a leitura em segundo plano e retorna; onde
+    não existe (Windows, macOS) não faz nada.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _extract_one(fp: str, use_ocr: bool, clean_special_chars: bool,
+                 cache_dir: Optional[str] = None, auto_ocr: bool = False) -> Dict[str, Any]:
+    """Extrai o texto de um arquivo e monta o documento.
+
+    Função de módulo para poder ser enviada aos processos do pool. Com
+    `cache_dir`, reaproveita o texto já extraído de um arquivo de mesmo conteúdo
+    (textos de OCR que falhou não são guardados).
+    """
+    text = key = None
+    if cache_dir is not None:
+        try:
+            key = _cache.key(fp, use_ocr, clean_special_chars, auto_ocr)
+            text = _cache.get(cache_dir, key)
+        except OSError:
+            pass  # extract_text relata o erro de leitura
+    if text is None:
+        text, degraded = reader.extract_text_with_status(
+            fp, use_ocr=use_ocr, clean_special_chars=clean_special_chars, auto_ocr=auto_ocr)
+        # Texto de um OCR que falhou não vai para o cache: a próxima execução
+        # tenta o OCR de novo
+        if key is not None and not degraded:
+            _cache.put(cache_dir, key, text)
+    else:
+        logger.info(f"Texto de {os.path.basename(fp)} obtido do cache de extração")
+    name = os.path.basename(fp)
+    return {
+        "source_path": str(fp),
+        "filename": name,
+        "filetype": os.path.splitext(name)[1].lower().lstrip('.'),
+        "text": text,
+    }
+
+
+def _extract_batch(fps: List[str], use_ocr: bool, clean_special_chars: bool,
+                   cache_dir: Optional[str] = None, auto_ocr: bool = False) -> List[tuple]:
+    """Extrai vários arquivos numa única tarefa do pool.
+
+    Returns:
+        Lista de (documento, None) ou (None, exceção), na ordem de `fps`
+    """
+    outcomes = []
+    for fp in fps:
+        try:
+            outcomes.append((_extract_one(fp, use_ocr, clean_special_chars, cache_dir, auto_ocr), None))
+        except Exception as e:
+            outcomes.append((None, e))
+    return outcomes
+
+
+def _is_small(fp: str) -> bool:
+    if os.path.splitext(fp)[1].lower() == '.pdf':
+        return False
+    try:
+        return os.path.getsize(fp) < _SMALL_FILE_BYTES
+    except OSError:
+        return True  # o erro é relatado na extração
+
+
+def iter_docs(
+    candidates: List[str],
+    use_ocr: bool = False,
+    clean_special_chars: bool = True,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    errors: Optional[List[str]] = None,
+    max_workers: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    auto_ocr: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Extrai o texto dos arquivos e gera os documentos na ordem de entrada.
+
+    Cada documento é entregue assim que ele e os anteriores ficam prontos, então
+    quem consome (ex.: `chunker.chunk_and_write`) não precisa ter todos os textos
+    na memória ao mesmo tempo. No pool, no máximo `_IN_FLIGHT_PER_WORKER` tarefas
+    por processo ficam em andamento ou aguardando consumo; cada tarefa é um
+    arquivo ou um grupo de arquivos pequenos consecutivos.
+
+    Args:
+        candidates: Caminhos dos arquivos a processar
+        use_ocr: Se deve forçar OCR em PDFs
+        clean_special_chars: Se deve limpar caracteres especiais
+        progress_callback: Chamado como (concluídos, total, caminho) a cada arquivo
+            finalizado, sempre no processo/thread que consome o gerador
+        errors: Lista opcional que recebe "nome: erro" para cada arquivo que falhou
+        max_workers: Número máximo de processos (padrão: número de CPUs)
+        cache_dir: Diretório do cache de textos extraídos (ver `_cache`); None
+            desativa o cache. Ao final, o cache é reduzido ao limite de tamanho
+        auto_ocr: Se True, PDFs escaneados passam por OCR mesmo sem `use_ocr`
+            (ver `reader.extract_text`)
+
+    Yields:
+        Documentos (source_path, filename, filetype, text); arquivos com erro são
+        omitidos
+    """
+    total = len(candidates)
+
+    def record_error(fp: str, e: Exception) -> None:
+        logger.error(f"Erro lendo {fp}: {e}")
+        if errors is not None:
+            errors.append(f"{Path(fp).name}: {e}")
+
+    if total < _MIN_FILES_FOR_POOL:
+        for i, fp in enumerate(candidates):
+            doc = None
+            try:
+                doc = _extract_one(fp, use_ocr, clean_special_chars, cache_dir, auto_ocr)
+            except Exception as e:
+                record_error(fp, e)
+            if progress_callback:
+                progress_callback(i + 1, total, fp)
+            if doc is not None:
+                yield doc
+        if cache_dir is not None:
+            _cache.prune(cache_dir)
+        return
+
+    cpus = os.cpu_count() or 1
+    workers = min(max_workers or cpus, total)
+    window = workers * _IN_FLIGHT_PER_WORKER
+    # Um PDF com OCR também paraleliza suas páginas em threads: cada processo
+    # fica com sua parte das CPUs (1 thread com o pool do tamanho da máquina)
+    with ProcessPoolExecutor(max_workers=workers, initializer=ocr.set_page_workers,
+                             initargs=(cpus // workers,)) as ex:
+        running = {}  # future -> (início, fim) das posições da tarefa
+        tasks = deque()  # fim de cada tarefa ainda não totalmente entregue
+        finished: Dict[int, Optional[Dict[str, Any]]] = {}
+        next_submit = next_yield = done = 0
+        try:
+            while next_yield < total:
+                while next_submit < total and len(tasks) < window:
+                    end = next_submit + 1
+                    if _is_small(candidates[next_submit]):
+                        while (end < total and end - next_submit < _SMALL_FILES_PER_TASK
+                               and _is_small(candidates[end])):
+                            end += 1
+                    fut = ex.submit(_extract_batch, candidates[next_submit:end],
+                                    use_ocr, clean_special_chars, cache_dir, auto_ocr)
+                    running[fut] = (next_submit, end)
+                    tasks.append(end)
+                    # Arquivos uma janela à frente já começam a ser lidos do
+                    # disco enquanto os atuais são processados
+                    for j in range(next_submit + window, min(end + window, total)):
+                        _prefetch(candidates[j])
+                    next_submit = end
+
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in completed:
+                    start, end = running.pop(fut)
+                    try:
+                        outcomes = fut.result()
+                    except Exception as e:
+                        outcomes = [(None, e)] * (end - start)
+                    for i, (doc, error) in enumerate(outcomes, start):
+                        if error is not None:
+                            record_error(candidates[i], error)
+                        finished[i] = doc
+                        done += 1
+                        if progress_callback:
+                            progress_callback(done, total, candidates[i])
+
+                while next_yield in finished:
+                    doc = finished.pop(next_yield)
+                    next_yield += 1
+                    if tasks and tasks[0] <= next_yield:
+                        tasks.popleft()
+                    if doc is not None:
+                        yield doc
+        finally:
+            # Gerador fechado antes do fim: não iniciar o que ainda está na fila
+            for fut in running:
+                fut.cancel()
+
+    if cache_dir is not None:
+        _cache.prune(cache_dir)
+
+
+def process_files_to_docs(
+    candidates: List[str],
+    use_ocr: bool = False,
+    clean_special_chars: bool = True,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    errors: Optional[List[str]] = None,
+    max_workers: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    auto_ocr: bool = False,
+) -> List[Dict[str, Any]]:
+    """Extrai o texto dos arquivos e retorna os documentos na ordem de entrada.
+
+    Versão em lista de `iter_docs` (mesmos argumentos).
+
+    Returns:
+        Lista de documentos (source_path, filename, filetype, text); arquivos com
+        erro são omitidos
+    """
+    return list(iter_docs(candidates, use_ocr, clean_special_chars, progress_callback, errors, max_workers,
+                          cache_dir, auto_ocr))
@@ -6,23 +6,94 @@ Estratégia:
 - Salva o `vectorizer` treinado, a matriz TF-IDF e os metadados dos chunks.
 - A consulta é feita transformando a query com o mesmo vectorizer e calculando
   a similaridade de cosseno com todos os chunks para encontrar os mais relevantes.
+  Como as linhas já são normalizadas (norma L2), a similaridade é um produto
+  esparso matriz-vetor, e só os top_k são ordenados.
 """
 from pathlib import Path
-import json
+from concurrent.futures import ThreadPoolExecutor
 import joblib
-from typing import List, Dict, Any
+import pickle
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 
+from . import _json
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 try:
+    import numpy as np
     from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
 except ImportError:
+    np = None
     TfidfVectorizer = None
-    cosine_similarity = None
 
 
 logger = logging.getLogger(__name__)
 
+# Leituras de JSON simultâneas em build_index (I/O libera o GIL)
+_READ_WORKERS = 16
+
+_INDEX_FILES = ("tfidf_vectorizer.joblib", "tfidf_matrix.joblib", "metadata.json")
+
+# Índices já carregados neste processo: chave = diretório resolvido,
+# valor = (mtimes dos arquivos, (vectorizer, matriz, metadados))
+_index_cache: Dict[str, Tuple[Tuple[int, ...], Tuple[Any, Any, List[Dict[str, Any]]]]] = {}
+
+
+def _load_vectorizer(path: Path) -> Any:
+    """Carrega o vectorizer salvo por `build_index`.
+
+    O vectorizer é gravado com `pickle` (o Unpickler em C é várias vezes mais
+    rápido que o de joblib para o dicionário de vocabulário); índices antigos,
+    gravados com `joblib.dump`, continuam sendo lidos com joblib.
+    """
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (pickle.UnpicklingError, ValueError):
+        return joblib.load(path)
+
+
+def _load_index(index_dir: Path) -> Tuple[Any, Any, List[Dict[str, Any]]]:
+    """Carrega (vectorizer, matriz, metadados) do índice, reaproveitando o cache.
+
+    A matriz é aberta com `mmap_mode='r'`: os arrays da matriz esparsa são
+    mapeados do arquivo em vez de copiados para a memória. O cache é
+    invalidado quando algum arquivo do índice muda (mtime).
+    """
+    key = str(Path(index_dir).resolve())
+    mtimes = tuple((index_dir / name).stat().st_mtime_ns for name in _INDEX_FILES)
+    cached = _index_cache.get(key)
+    if cached is not None and cached[0] == mtimes:
+        return cached[1]
+
+    vectorizer = _load_vectorizer(index_dir / "tfidf_vectorizer.joblib")
+    tfidf_matrix = joblib.load(index_dir / "tfidf_matrix.joblib", mmap_mode="r")
+    metadata = _json.loads((index_dir / "metadata.json").read_bytes())
+    loaded = (vectorizer, tfidf_matrix, metadata)
+    _index_cache[key] = (mtimes, loaded)
+    return loaded
+
+
+def _read_documents(jf_path: Path) -> Optional[List[Dict[str, Any]]]:
+    """Lê os documentos de um arquivo JSON de batch.
+
+    Com ijson (opcional) a lista `documents` é lida em streaming, sem manter
+    o arquivo inteiro e o batch completo na memória ao mesmo tempo.
+    Retorna None (com aviso) em caso de falha.
+    """
+    try:
+        if ijson is not None:
+            with open(jf_path, "rb") as f:
+                return list(ijson.items(f, "documents.item", use_float=True))
+        return _json.loads(jf_path.read_bytes()).get("documents", [])
+    except Exception as e:
+        logger.warning(f"Falha ao ler JSON para indexação: {jf_path}: {e}")
+        return None
+
 
 def build_index(out_dir: Path, json_files: List[str]) -> Path:
     """Constrói e salva um índice TF-IDF a partir dos arquivos JSON gerados.
@@ -45,20 +116,22 @@ def build_index(out_dir: Path, json_files: List[str]) -> Path:
     # Nome mais descritivo para o diretório do índice
     index_dir = out_dir / "indice_busca_tfidf"
     index_dir.mkdir(exist_ok=True)
+    _index_cache.pop(str(index_dir.resolve()), None)
 
     corpus = []
     metadata = []
     
-    for jf_name in json_files:
-        jf_path = out_dir / jf_name if not Path(jf_name).is_absolute() else Path(jf_name)
-        try:
-            with open(jf_path, "r", encoding="utf-8") as f:
-                batch = json.load(f)
-        except Exception as e:
-            logger.warning(f"Falha ao ler JSON para indexação: {jf_path}: {e}")
+    paths = [out_dir / jf_name if not Path(jf_name).is_absolute() else Path(jf_name)
+             for jf_name in json_files]
+    # Ler os arquivos em paralelo; map preserva a ordem de entrada
+    with ThreadPoolExecutor(max_workers=max(1, min(_READ_WORKERS, len(paths)))) as ex:
+        batches = list(ex.map(_read_documents, paths))
+
+    for jf_path, documents in zip(paths, batches):
+        if documents is None:
             continue
 
-        for doc_pos, doc in enumerate(batch.get("documents", [])):
+        for doc_pos, doc in enumerate(documents):
             corpus.append(doc.get("text", ""))
             metadata.append({
                 "json_file": jf_path.name,
@@ -76,17 +149,10 @@ def build_index(out_dir: Path, json_files: List[str]) -> Path:
     # Ajustamos os parâmetros para funcionar com qualquer tamanho de corpus
     num_docs = len(corpus)
     
-    # Para corpus muito pequenos (1-2 documentos), ajustamos max_df e min_df
-    if num_docs == 1:
-        max_df_value = 1.0
-        min_df_value = 1
-    elif num_docs == 2:
-        max_df_value = 1.0
-        min_df_value = 1
-    else:
-        # Para corpus maiores, usamos configurações mais restritivas
-        max_df_value = 0.85
-        min_df_value = 1
+    # Para corpus muito pequenos (1-2 documentos) não descartamos termos
+    # frequentes; para corpus maiores, usamos configurações mais restritivas
+    max_df_value = 1.0 if num_docs <= 2 else 0.85
+    min_df_value = 1
     
     vectorizer = TfidfVectorizer(
         ngram_range=(1, 2), 
@@ -101,10 +167,11 @@ def build_index(out_dir: Path, json_files: List[str]) -> Path:
 
     # Salvar os artefatos do índice
     try:
-        joblib.dump(vectorizer, index_dir / "tfidf_vectorizer.joblib")
+        # pickle puro (também legível por joblib.load); ver _load_vectorizer
+        with open(index_dir / "tfidf_vectorizer.joblib", "wb") as f:
+            pickle.dump(vectorizer, f, protocol=pickle.HIGHEST_PROTOCOL)
         joblib.dump(tfidf_matrix, index_dir / "tfidf_matrix.joblib")
-        with open(index_dir / "metadata.json", "w", encoding="utf-8") as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        (index_dir / "metadata.json").write_bytes(_json.dumps(metadata, pretty=True))
         logger.info(f"Índice TF-IDF salvo em {index_dir}")
     except Exception as e:
         logger.exception(f"Erro ao salvar índice TF-IDF: {e}")
@@ -124,14 +191,11 @@ def query_index(index_dir: Path, query: str, top_k: int = 5) -> List[Dict[str, A
     Returns:
         Uma lista de dicionários, cada um contendo o metadado do chunk e o score de similaridade.
     """
-    if cosine_similarity is None:
+    if TfidfVectorizer is None:
         raise RuntimeError("scikit-learn não está instalado.")
 
     try:
-        vectorizer = joblib.load(index_dir / "tfidf_vectorizer.joblib")
-        tfidf_matrix = joblib.load(index_dir / "tfidf_matrix.joblib")
-        with open(index_dir / "metadata.json", "r", encoding="utf-8") as f:
-            metadata = json.load(f)
+        vectorizer, tfidf_matrix, metadata = _load_index(index_dir)
     except FileNotFoundError:
         logger.error(f"Índice não encontrado em {index_dir}. Execute a indexação primeiro.")
         return []
@@ -145,19 +209,27 @@ def query_index(index_dir: Path, query: str, top_k: int = 5) -> List[Dict[str, A
     # Transformar a query usando o mesmo vectorizer
     query_vector = vectorizer.transform([query])
 
-    # Calcular similaridade de cosseno
-    cosine_similarities = cosine_similarity(query_vector, tfidf_matrix).flatten()
+    # Similaridade de cosseno: query e linhas da matriz têm norma L2 = 1,
+    # então basta o produto esparso (sem materializar a matriz densa)
+    scores = (tfidf_matrix @ query_vector.T).toarray().ravel()
 
-    # Obter os top_k resultados
-    # argsort retorna os índices do menor para o maior, então pegamos os últimos k e invertemos
-    relevant_indices = cosine_similarities.argsort()[-top_k:][::-1]
+    # Selecionar os top_k sem ordenar todas as similaridades
+    n = scores.shape[0]
+    if top_k <= 0 or n == 0:
+        return []
+    if top_k < n:
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        top = np.arange(n)
+    relevant_indices = top[np.argsort(-scores[top], kind="stable")]
 
     results = []
     for i in relevant_indices:
         # Ignorar resultados com score muito baixo
-        if cosine_similarities[i] > 0.01:
-            result = metadata[i]
-            result["score"] = float(cosine_similarities[i])
+        if scores[i] > 0.01:
+            # Cópia: os metadados ficam no cache e não devem receber o score
+            result = dict(metadata[i])
+            result["score"] = float(scores[i])
             results.append(result)
             
     return results
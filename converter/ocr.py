@@ -6,20 +6,36 @@ Funcionalidades:
 - Normalização de texto
 """
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import os
 import re
-
-try:
-    import pytesseract
-    from PIL import Image
-    from pdf2image import convert_from_path
-except ImportError:
-    pytesseract = None
-    Image = None
-    convert_from_path = None
+import tempfile
 
 logger = logging.getLogger(__name__)
 
+# Caracteres que não são alfanuméricos nem espaço (equivale a
+# `not (c.isalnum() or c.isspace())`; \w inclui "_", por isso a alternativa)
+_NON_TEXT_RE = re.compile(r'[^\w\s]|_')
+
+# Idiomas passados ao tesseract
+_OCR_LANG = 'por+eng'
+# Separador que o tesseract grava entre páginas ao ler uma lista de imagens
+_PAGE_SEPARATOR = '\f'
+# Máximo de páginas renderizadas e reconhecidas por tarefa: limita as imagens
+# na memória e deixa o Poppler renderizar um grupo enquanto outro passa pelo OCR
+_MAX_PAGES_PER_GROUP = 8
+
+# Threads de OCR por PDF neste processo (None: número de CPUs). Os pools de
+# processos que extraem vários arquivos (file_utils, pdf_to_word) reduzem o
+# valor em cada processo (ver set_page_workers) para que processos × threads
+# não passe do número de CPUs.
+_page_workers = None
+
+# Expressões usadas por clean_text
+_WHITESPACE_RE = re.compile(r'\s+')
+_DISALLOWED_RE = re.compile(r'[^\w\s\.\,\!\?\;\:\-\(\)\[\]\"\'\/\\\n\r]', re.UNICODE)
+
 
 def clean_text(text: str, simple_mode: bool = True) -> str:
     """Limpa e normaliza texto removendo caracteres especiais.
@@ -34,22 +50,57 @@ def clean_text(text: str, simple_mode: bool = True) -> str:
     if not text:
         return ""
     
-    # Normalizar espaços em branco
-    text = re.sub(r'\s+', ' ', text.strip())
+    # Normalizar espaços em branco (após isto não restam quebras de linha nem
+    # caracteres de controle que sejam espaço)
+    text = _WHITESPACE_RE.sub(' ', text.strip())
     
     if simple_mode:
-        # Manter apenas letras, números, espaços e pontuação básica
-        text = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)\[\]\"\'\/\\\n\r]', '', text, flags=re.UNICODE)
-        
-        # Remover caracteres de controle
-        text = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', text)
-        
-        # Normalizar quebras de linha múltiplas
-        text = re.sub(r'\n\s*\n', '\n\n', text)
+        # Manter apenas letras, números, espaços e pontuação básica; isto já
+        # remove os demais caracteres de controle (\x00-\x1f, \x7f-\x9f)
+        text = _DISALLOWED_RE.sub('', text)
     
     return text.strip()
 
 
+def set_page_workers(n: int) -> None:
+    """Define quantas threads `ocr_pdf` usa por PDF neste processo.
+
+    Usada como `initializer` dos pools de processos.
+    """
+    global _page_workers
+    _page_workers = max(1, n)
+
+
+def _ocr_pages(pytesseract, images) -> list:
+    """Executa o OCR de várias páginas em uma única chamada do tesseract.
+
+    Cada execução do tesseract carrega de novo os modelos de idioma; com um
+    arquivo listando as imagens, esse custo é pago uma vez por grupo. Se a
+    saída não puder ser separada por página, faz uma chamada por imagem.
+    """
+    if len(images) == 1:
+        return [pytesseract.image_to_string(images[0], lang=_OCR_LANG)]
+
+    with tempfile.TemporaryDirectory(prefix='ocr_') as tmp_dir:
+        paths = []
+        for i, image in enumerate(images):
+            path = os.path.join(tmp_dir, f'{i:05d}.png')
+            image.save(path)
+            paths.append(path)
+        list_path = os.path.join(tmp_dir, 'paginas.txt')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(paths) + '\n')
+        text = pytesseract.image_to_string(list_path, lang=_OCR_LANG)
+
+    pages = text.split(_PAGE_SEPARATOR)
+    if len(pages) == len(images) + 1 and not pages[-1].strip():
+        pages.pop()  # separador também após a última página
+    if len(pages) != len(images):
+        logger.warning("Saída do tesseract não separável por página; processando uma a uma")
+        return [pytesseract.image_to_string(image, lang=_OCR_LANG) for image in images]
+    return pages
+
+
 def ocr_pdf(pdf_path: str, clean_special_chars: bool = True) -> str:
     """Extrai texto de PDF usando OCR.
     
@@ -63,28 +114,39 @@ def ocr_pdf(pdf_path: str, clean_special_chars: bool = True) -> str:
     Raises:
         RuntimeError: Se dependências OCR não estão instaladas
     """
-    if not all([pytesseract, Image, convert_from_path]):
+    # Importados só aqui: clean_text e is_scanned_pdf não precisam deles
+    try:
+        import pytesseract
+        from pdf2image import convert_from_path, pdfinfo_from_path
+    except ImportError:
         raise RuntimeError(
             "Dependências OCR não encontradas. Instale: pip install pytesseract Pillow pdf2image"
         )
     
     try:
-        # Converter PDF para imagens
-        logger.info(f"Convertendo PDF para imagens: {pdf_path}")
-        images = convert_from_path(pdf_path, dpi=200)
-        
-        extracted_text = []
-        
-        for i, image in enumerate(images):
-            logger.info(f"Processando página {i+1}/{len(images)}")
-            
-            # Aplicar OCR na imagem
-            page_text = pytesseract.image_to_string(image, lang='por+eng')
-            
-            if clean_special_chars:
-                page_text = clean_text(page_text)
-            
-            extracted_text.append(page_text)
+        n_pages = int(pdfinfo_from_path(pdf_path)["Pages"])
+        logger.info(f"OCR de {n_pages} páginas: {pdf_path}")
+
+        # Cada tarefa renderiza (Poppler) um grupo contíguo de páginas e o
+        # reconhece numa única chamada do tesseract. Ambos rodam em subprocessos
+        # (fora do GIL), então com várias tarefas em paralelo a renderização de
+        # um grupo se sobrepõe ao OCR de outro, e só os grupos em andamento
+        # ficam na memória. map preserva a ordem das páginas. Os grupos são
+        # dimensionados pelo número de threads efetivo.
+        workers = max(1, min(_page_workers or os.cpu_count() or 1, n_pages))
+        group_size = max(1, min(_MAX_PAGES_PER_GROUP, -(-n_pages // workers)))
+
+        def ocr_group(first):
+            last = min(first + group_size - 1, n_pages)
+            images = convert_from_path(pdf_path, dpi=200, first_page=first, last_page=last)
+            logger.info(f"Processando páginas {first}-{last}/{n_pages}")
+            return _ocr_pages(pytesseract, images)
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            group_texts = ex.map(ocr_group, range(1, n_pages + 1, group_size))
+            extracted_text = [page for texts in group_texts for page in texts]
+        if clean_special_chars:
+            extracted_text = [clean_text(page_text) for page_text in extracted_text]
         
         full_text = '\n\n--- PÁGINA {} ---\n\n'.join(
             f"{i+1}\n{text}" for i, text in enumerate(extracted_text) if text.strip()
@@ -98,6 +160,20 @@ def ocr_pdf(pdf_path: str, clean_special_chars: bool = True) -> str:
         raise
 
 
+def _looks_scanned(text: str) -> bool:
+    """Heurística de `is_scanned_pdf` aplicada a um texto já extraído."""
+    # Se o texto extraído é muito pequeno ou contém muitos caracteres estranhos,
+    # provavelmente é um PDF escaneado
+    if len(text.strip()) < 100:
+        return True
+
+    # Verificar se há muitos caracteres não alfanuméricos
+    # (contagem feita pelo motor de regex, sem laço Python por caractere)
+    non_text = len(text) - len(_NON_TEXT_RE.sub('', text))
+    alphanumeric_ratio = 1 - non_text / len(text)
+    return alphanumeric_ratio < 0.7
+
+
 def is_scanned_pdf(pdf_path: str) -> bool:
     """Verifica se um PDF é escaneado (sem texto extraível).
     
@@ -110,20 +186,7 @@ def is_scanned_pdf(pdf_path: str) -> bool:
     try:
         # Tentar extrair texto normal primeiro
         from .reader import read_pdf
-        text = read_pdf(Path(pdf_path))
-        
-        # Se o texto extraído é muito pequeno ou contém muitos caracteres estranhos,
-        # provavelmente é um PDF escaneado
-        if len(text.strip()) < 100:
-            return True
-        
-        # Verificar se há muitos caracteres não alfanuméricos
-        alphanumeric_ratio = sum(c.isalnum() or c.isspace() for c in text) / len(text)
-        if alphanumeric_ratio < 0.7:
-            return True
-        
-        return False
-        
+        return _looks_scanned(read_pdf(Path(pdf_path)))
     except Exception:
         # Se não conseguir extrair texto, assumir que é escaneado
         return True
@@ -140,15 +203,22 @@ def extract_text_with_ocr(pdf_path: str, force_ocr: bool = False, clean_special_
     Returns:
         Texto extraído
     """
-    if force_ocr or is_scanned_pdf(pdf_path):
+    text = None
+    if not force_ocr:
+        # O texto extraído aqui serve tanto para decidir se o PDF é escaneado
+        # quanto como resultado, sem processar o PDF duas vezes
+        from .reader import read_pdf
+        try:
+            text = read_pdf(Path(pdf_path))
+        except Exception:
+            text = None
+
+    if text is None or _looks_scanned(text):
         logger.info(f"Usando OCR para PDF: {pdf_path}")
         return ocr_pdf(pdf_path, clean_special_chars)
-    else:
-        logger.info(f"Extraindo texto normal do PDF: {pdf_path}")
-        from .reader import read_pdf
-        text = read_pdf(Path(pdf_path))
-        
-        if clean_special_chars:
-            text = clean_text(text)
-        
-        return text
\ No newline at end of file
+
+    logger.info(f"Extraindo texto normal do PDF: {pdf_path}")
+    if clean_special_chars:
+        text = clean_text(text)
+
+    return text
@@ -6,26 +6,40 @@ Funcionalidades:
 - Formatação de dados para diferentes saídas
 """
 from pathlib import Path
-import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import logging
+import os
 from datetime import datetime
+from functools import partial
+from xml.sax.saxutils import escape as _xml_escape
 from typing import Dict, Any, List, Optional
-from collections import defaultdict
-import re
 
-try:
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.lib import colors
-except ImportError:
-    SimpleDocTemplate = None
-    Paragraph = None
-    getSampleStyleSheet = None
+from . import _json, file_utils
+from .chunker import WRITE_BUFFER_BYTES, build_local_index
+
+__all__ = ["json_to_txt", "json_to_pdf", "json_to_mrd", "convert_json_files"]
 
 logger = logging.getLogger(__name__)
 
+# Metadados exibidos para cada documento (TXT e PDF): (chave, rótulo)
+_META_FIELDS = (
+    ('filename', 'Arquivo'),
+    ('filetype', 'Tipo'),
+    ('source_path', 'Caminho'),
+    ('char_count', 'Caracteres'),
+    ('chunk_index', 'Chunk'),
+)
+
+_JSON_EXTS = frozenset({'.json'})
+
+# Linhas separadoras do relatório TXT
+_TXT_RULE = "=" * 80 + "\n"
+_TXT_SEP = "-" * 80 + "\n"
+_TXT_SUBRULE = "-" * 40 + "\n"
+
+# Abaixo deste número de arquivos a conversão é feita em série
+_MIN_FILES_FOR_POOL = 3
+
 
 def json_to_txt(json_data: Dict[str, Any], output_path: str = None, embed_index: bool = False) -> str:
     """Converte dados JSON para formato TXT legível.
@@ -45,67 +59,57 @@ def json_to_txt(json_data: Dict[str, Any], output_path: str = None, embed_index:
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        # Cabeçalho
-        f.write("=" * 80 + "\n")
-        f.write("RELATÓRIO DE DOCUMENTOS PROCESSADOS\n")
-        f.write("=" * 80 + "\n\n")
+    docs = json_data.get('documents', []) or []
+    # Montar o texto em partes e gravar com uma única escrita
+    parts = [_TXT_RULE, "RELATÓRIO DE DOCUMENTOS PROCESSADOS\n", _TXT_RULE, "\n"]
+    
+    # Informações do batch
+    if 'batch_id' in json_data:
+        parts.append(f"ID do Lote: {json_data['batch_id']}\n")
+    if 'created_at' in json_data:
+        parts.append(f"Criado em: {json_data['created_at']}\n")
+    
+    parts.append(f"Total de documentos: {len(docs)}\n\n")
+    
+    # Índice de documentos (se solicitado)
+    if embed_index:
+        parts += [_TXT_RULE, "ÍNDICE DE DOCUMENTOS\n", _TXT_RULE, "\n"]
         
-        # Informações do batch
-        if 'batch_id' in json_data:
-            f.write(f"ID do Lote: {json_data['batch_id']}\n")
-        if 'created_at' in json_data:
-            f.write(f"Criado em: {json_data['created_at']}\n")
+        for i, doc in enumerate(docs, 1):
+            filename = doc.get('filename', 'Sem nome')
+            chunk_idx = doc.get('chunk_index', 0)
+            char_count = doc.get('char_count', 0)
+            
+            if chunk_idx > 0:
+                parts.append(f"{i}. {filename} (Parte {chunk_idx + 1}) - {char_count} caracteres\n")
+            else:
+                parts.append(f"{i}. {filename} - {char_count} caracteres\n")
         
-        f.write(f"Total de documentos: {len(json_data.get('documents', []))}\n\n")
+        parts += ["\n", _TXT_RULE, "\n"]
+    
+    # Documentos
+    for i, doc in enumerate(docs, 1):
+        parts += [_TXT_SEP, f"DOCUMENTO {i}\n", _TXT_SEP]
         
-        # Índice de documentos (se solicitado)
-        if embed_index:
-            f.write("=" * 80 + "\n")
-            f.write("ÍNDICE DE DOCUMENTOS\n")
-            f.write("=" * 80 + "\n\n")
-            
-            for i, doc in enumerate(json_data.get('documents', []), 1):
-                filename = doc.get('filename', 'Sem nome')
-                chunk_idx = doc.get('chunk_index', 0)
-                char_count = doc.get('char_count', 0)
-                
-                if chunk_idx > 0:
-                    f.write(f"{i}. {filename} (Parte {chunk_idx + 1}) - {char_count} caracteres\n")
-                else:
-                    f.write(f"{i}. {filename} - {char_count} caracteres\n")
-            
-            f.write("\n" + "=" * 80 + "\n\n")
+        # Metadados
+        parts.extend(f"{label}: {doc[key]}\n" for key, label in _META_FIELDS if key in doc)
+        parts.append("\n")
         
-        # Documentos
-        for i, doc in enumerate(json_data.get('documents', []), 1):
-            f.write("-" * 80 + "\n")
-            f.write(f"DOCUMENTO {i}\n")
-            f.write("-" * 80 + "\n")
-            
-            # Metadados
-            if 'filename' in doc:
-                f.write(f"Arquivo: {doc['filename']}\n")
-            if 'filetype' in doc:
-                f.write(f"Tipo: {doc['filetype']}\n")
-            if 'source_path' in doc:
-                f.write(f"Caminho: {doc['source_path']}\n")
-            if 'char_count' in doc:
-                f.write(f"Caracteres: {doc['char_count']}\n")
-            if 'chunk_index' in doc:
-                f.write(f"Chunk: {doc['chunk_index']}\n")
-            
-            f.write("\n")
-            
-            # Conteúdo
-            f.write("CONTEÚDO:\n")
-            f.write("-" * 40 + "\n")
-            text = doc.get('text', '')
-            if text:
-                f.write(text)
-                f.write("\n\n")
-            else:
-                f.write("(Sem conteúdo de texto)\n\n")
+        # Conteúdo
+        parts += ["CONTEÚDO:\n", _TXT_SUBRULE]
+        text = doc.get('text', '')
+        if text:
+            parts += [text, "\n\n"]
+        else:
+            parts.append("(Sem conteúdo de texto)\n\n")
+    
+    # Codificar uma única vez e gravar em modo binário (sem a camada de texto),
+    # mantendo o fim de linha da plataforma como no modo texto
+    data = "".join(parts)
+    if os.linesep != "\n":
+        data = data.replace("\n", os.linesep)
+    with open(output_path, 'wb', buffering=WRITE_BUFFER_BYTES) as f:
+        f.write(data.encode('utf-8'))
     
     logger.info(f"Arquivo TXT criado: {output_path}")
     return str(output_path)
@@ -125,7 +129,13 @@ def json_to_pdf(json_data: Dict[str, Any], output_path: str = None, embed_index:
     Raises:
         RuntimeError: Se dependências não estão instaladas
     """
-    if not SimpleDocTemplate:
+    # reportlab é importado só aqui: é pesado e só é usado na saída PDF
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib import colors
+    except ImportError:
         raise RuntimeError(
             "Dependência reportlab não encontrada. Instale: pip install reportlab"
         )
@@ -166,6 +176,12 @@ def json_to_pdf(json_data: Dict[str, Any], output_path: str = None, embed_index:
         textColor=colors.darkblue
     )
     
+    # Corpo do texto: o espaço após cada parágrafo faz parte do estilo
+    # (evita um Spacer extra por parágrafo)
+    body_style = ParagraphStyle('CustomBody', parent=styles['Normal'], spaceAfter=6)
+    
+    docs = json_data.get('documents', []) or []
+    n_docs = len(docs)
     content = []
     
     # Título
@@ -178,7 +194,7 @@ def json_to_pdf(json_data: Dict[str, Any], output_path: str = None, embed_index:
     if 'created_at' in json_data:
         content.append(Paragraph(f"<b>Criado em:</b> {json_data['created_at']}", styles['Normal']))
     
-    content.append(Paragraph(f"<b>Total de documentos:</b> {len(json_data.get('documents', []))}", styles['Normal']))
+    content.append(Paragraph(f"<b>Total de documentos:</b> {n_docs}", styles['Normal']))
     content.append(Spacer(1, 20))
     
     # Índice de documentos (se solicitado)
@@ -186,7 +202,7 @@ def json_to_pdf(json_data: Dict[str, Any], output_path: str = None, embed_index:
         content.append(Paragraph("ÍNDICE DE DOCUMENTOS", heading_style))
         content.append(Spacer(1, 12))
         
-        for i, doc in enumerate(json_data.get('documents', []), 1):
+        for i, doc in enumerate(docs, 1):
             filename = doc.get('filename', 'Sem nome')
             chunk_idx = doc.get('chunk_index', 0)
             char_count = doc.get('char_count', 0)
@@ -202,24 +218,13 @@ def json_to_pdf(json_data: Dict[str, Any], output_path: str = None, embed_index:
         content.append(PageBreak())
     
     # Documentos
-    for i, doc in enumerate(json_data.get('documents', []), 1):
+    for i, doc in enumerate(docs, 1):
         content.append(Paragraph(f"DOCUMENTO {i}", heading_style))
         
         # Metadados
-        metadata = []
-        if 'filename' in doc:
-            metadata.append(f"<b>Arquivo:</b> {doc['filename']}")
-        if 'filetype' in doc:
-            metadata.append(f"<b>Tipo:</b> {doc['filetype']}")
-        if 'source_path' in doc:
-            metadata.append(f"<b>Caminho:</b> {doc['source_path']}")
-        if 'char_count' in doc:
-            metadata.append(f"<b>Caracteres:</b> {doc['char_count']}")
-        if 'chunk_index' in doc:
-            metadata.append(f"<b>Chunk:</b> {doc['chunk_index']}")
-        
-        for meta in metadata:
-            content.append(Paragraph(meta, styles['Normal']))
+        for key, label in _META_FIELDS:
+            if key in doc:
+                content.append(Paragraph(f"<b>{label}:</b> {doc[key]}", styles['Normal']))
         
         content.append(Spacer(1, 12))
         
@@ -232,22 +237,21 @@ def json_to_pdf(json_data: Dict[str, Any], output_path: str = None, embed_index:
             for para in paragraphs:
                 if para.strip():
                     # Escapar caracteres especiais para XML
-                    para_escaped = para.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+                    para_escaped = _xml_escape(para)
                     # Substituir quebras de linha simples por <br/> tags
                     para_escaped = para_escaped.replace('\n', '<br/>')
                     try:
-                        content.append(Paragraph(para_escaped, styles['Normal']))
-                        content.append(Spacer(1, 6))
+                        content.append(Paragraph(para_escaped, body_style))
                     except Exception as e:
                         # Se o parágrafo falhar, adicionar como texto simples truncado
                         logger.warning(f"Erro ao adicionar parágrafo: {e}")
                         safe_text = para[:500] + "..." if len(para) > 500 else para
-                        content.append(Paragraph(safe_text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;'), styles['Normal']))
+                        content.append(Paragraph(_xml_escape(safe_text), styles['Normal']))
         else:
             content.append(Paragraph("(Sem conteúdo de texto)", styles['Italic']))
         
         # Quebra de página entre documentos (exceto o último)
-        if i < len(json_data.get('documents', [])):
+        if i < n_docs:
             content.append(PageBreak())
     
     # Construir PDF
@@ -260,8 +264,11 @@ def json_to_pdf(json_data: Dict[str, Any], output_path: str = None, embed_index:
 def json_to_mrd(json_data: Dict[str, Any], output_path: str = None, embed_index: bool = True) -> str:
     """Converte um JSON de batch para um MRD (machine-readable document) com índice local.
 
-    MRD é um JSON enriquecido com metadados e um índice local (term -> referências)
-    que facilita buscas rápidas pela IA sem depender exclusivamente de um índice global.
+    MRD é um JSON enriquecido com metadados e um índice local
+    (``{"refs": [...], "postings": {termo: [[pos_ref, ocorrências], ...]}}``)
+    que facilita buscas rápidas pela IA sem depender exclusivamente de um
+    índice global. O arquivo é gravado em partes (cabeçalho, cada documento,
+    índice), sem montar o MRD inteiro em memória.
 
     Args:
         json_data: Dados do batch (mesmo formato gerado pelo chunker)
@@ -278,46 +285,32 @@ def json_to_mrd(json_data: Dict[str, Any], output_path: str = None, embed_index:
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # Construir o objeto MRD básico
-    mrd = {
-        "mrd_version": "1.0",
+    # Cabeçalho do MRD (a ordem das chaves define a ordem no arquivo)
+    header = {
+        "mrd_version": "1.1",
         "created_at": json_data.get("created_at") or datetime.utcnow().isoformat() + "Z",
         "batch_id": json_data.get("batch_id"),
-        "documents": json_data.get("documents", []),
     }
+    docs = json_data.get("documents", []) or []
 
-    # Embutir índice local simples (inverted index) se solicitado
-    if embed_index:
-        postings = defaultdict(list)
-        token_re = re.compile(r"\w+", re.UNICODE)
-        docs = mrd["documents"]
-        for pos, doc in enumerate(docs):
-            text = doc.get("text", "") or ""
-            tokens = token_re.findall(text.lower())
-            if not tokens:
-                continue
-            # Contar ocorrências por termo no documento
-            counts = {}
-            for t in tokens:
-                counts[t] = counts.get(t, 0) + 1
-            ref = {
-                "doc_pos": pos,
-                "chunk_index": doc.get("chunk_index", 0),
-                "filename": doc.get("filename"),
-                "char_count": doc.get("char_count", len(text)),
-            }
-            for term, freq in counts.items():
-                entry = dict(ref)
-                entry["occurrences"] = freq
-                postings[term].append(entry)
+    # Embutir índice local (inverted index) se solicitado: mesmo formato do
+    # índice embutido pelo chunker (refs + postings [pos_ref, ocorrências])
+    local_index = build_local_index(docs) if embed_index else None
 
-        # serializar postings
-        mrd["local_index"] = {k: v for k, v in postings.items()}
-
-    # Salvar MRD
+    # Salvar MRD (consumido por máquina: saída compacta, sem indentação)
     try:
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(mrd, f, ensure_ascii=False, indent=2)
+        with open(output_path, "wb", buffering=WRITE_BUFFER_BYTES) as f:
+            f.write(_json.dumps(header)[:-1])  # sem o "}" final
+            f.write(b',"documents":[')
+            for i, doc in enumerate(docs):
+                if i:
+                    f.write(b",")
+                f.write(_json.dumps(doc))
+            f.write(b"]")
+            if local_index is not None:
+                f.write(b',"local_index":')
+                f.write(_json.dumps(local_index))
+            f.write(b"}")
         logger.info(f"Arquivo MRD criado: {output_path}")
     except Exception as e:
         logger.error(f"Erro ao criar MRD {output_path}: {e}")
@@ -326,6 +319,34 @@ def json_to_mrd(json_data: Dict[str, Any], output_path: str = None, embed_index:
     return str(output_path)
 
 
+def _convert_one(json_file: Path, output_format: str, output_dir: Path, embed_index: bool) -> Optional[str]:
+    """Converte um arquivo JSON; retorna o caminho gerado ou None em caso de erro.
+
+    Função de módulo para poder ser enviada aos processos do pool.
+    """
+    try:
+        logger.info(f"Convertendo {json_file.name} para {output_format.upper()}")
+        
+        # Carregar dados JSON (_json.loads ignora BOM UTF-8)
+        json_data = _json.loads(json_file.read_bytes())
+        
+        # Definir arquivo de saída
+        output_name = f"{json_file.stem}.{output_format}"
+        output_path = output_dir / output_name
+        
+        # Converter
+        if output_format == 'txt':
+            return json_to_txt(json_data, str(output_path), embed_index=embed_index)
+        if output_format == 'pdf':
+            return json_to_pdf(json_data, str(output_path), embed_index=embed_index)
+        # MRD inclui índice local por batch
+        return json_to_mrd(json_data, str(output_path), embed_index=embed_index)
+        
+    except Exception as e:
+        logger.error(f"Erro convertendo {json_file}: {e}")
+        return None
+
+
 def convert_json_files(
     json_dir: str,
     output_format: str = 'txt',
@@ -356,43 +377,34 @@ def convert_json_files(
     
     converted_files = []
     if json_files:
-        file_candidates = [Path(p) for p in json_files if Path(p).is_file()]
+        # Sem stat prévio: arquivos ausentes falham (e são registrados) ao abrir
+        file_candidates = [Path(p) for p in json_files]
     else:
-        file_candidates = [p for p in json_dir.rglob("*.json") if p.is_file()]
+        file_candidates = [Path(p) for p in file_utils.iter_files([json_dir], True, _JSON_EXTS)]
     
     if not file_candidates:
         logger.warning(f"Nenhum arquivo JSON encontrado em {json_dir}")
         return converted_files
     
-    for json_file in sorted(file_candidates):
-        try:
-            logger.info(f"Convertendo {json_file.name} para {output_format.upper()}")
-            
-            # Carregar dados JSON (usar utf-8-sig para lidar com BOM)
-            with open(json_file, 'r', encoding='utf-8-sig') as f:
-                json_data = json.load(f)
-            
-            # Definir arquivo de saída
-            output_name = f"{json_file.stem}.{output_format}"
-            output_path = output_dir / output_name
-            
-            # Converter
-            if output_format.lower() == 'txt':
-                result_path = json_to_txt(json_data, str(output_path), embed_index=embed_index)
-            elif output_format.lower() == 'pdf':
-                result_path = json_to_pdf(json_data, str(output_path), embed_index=embed_index)
-            elif output_format.lower() == 'mrd':
-                # MRD inclui índice local por batch
-                result_path = json_to_mrd(json_data, str(output_path), embed_index=embed_index)
-            else:
-                logger.error(f"Formato não suportado: {output_format}")
-                continue
-            
-            converted_files.append(result_path)
-            
-        except Exception as e:
-            logger.error(f"Erro convertendo {json_file}: {e}")
-            continue
+    fmt = output_format.lower()
+    if fmt not in ('txt', 'pdf', 'mrd'):
+        logger.error(f"Formato não suportado: {output_format}")
+        return converted_files
+    
+    # Cada arquivo é independente. TXT é dominado por escrita em disco (threads
+    # bastam); PDF e MRD gastam CPU em Python, então usam processos.
+    # map preserva a ordem dos arquivos.
+    file_candidates = sorted(file_candidates)
+    worker = partial(_convert_one, output_format=fmt, output_dir=output_dir, embed_index=embed_index)
+    if len(file_candidates) < _MIN_FILES_FOR_POOL:
+        results = list(map(worker, file_candidates))
+    else:
+        workers = min(os.cpu_count() or 1, len(file_candidates))
+        executor_cls = ThreadPoolExecutor if fmt == 'txt' else ProcessPoolExecutor
+        with executor_cls(max_workers=workers) as ex:
+            results = list(ex.map(worker, file_candidates))
+    
+    converted_files.extend(r for r in results if r is not None)
     
     logger.info(f"Conversão concluída. {len(converted_files)} arquivos convertidos.")
     return converted_files
\ No newline at end of file
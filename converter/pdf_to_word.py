@@ -6,25 +6,34 @@ Funcionalidades:
 - Suporte a PDFs com texto e escaneados (via OCR)
 """
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import logging
-import tempfile
+import os
 
-try:
-    import docx
-    from docx import Document
-    from docx.shared import Inches
-except ImportError:
-    docx = None
-    Document = None
+from .ocr import extract_text_with_ocr, clean_text, set_page_workers
 
-try:
-    from pdf2image.exceptions import PDFInfoNotInstalledError
-except ImportError:
-    PDFInfoNotInstalledError = None
+logger = logging.getLogger(__name__)
 
-from .ocr import extract_text_with_ocr, clean_text
+# Pontuação que indica fim de frase (parágrafo curto sem ela vira título)
+_SENTENCE_END = '.!?:'
 
-logger = logging.getLogger(__name__)
+# Abaixo deste número de PDFs a conversão é feita em série
+_MIN_FILES_FOR_POOL = 3
+
+
+def _iter_paragraphs(text: str):
+    """Gera os trechos de `text` separados por "\\n\\n" (mesmo que text.split('\\n\\n')).
+
+    Evita montar a lista completa de parágrafos para textos grandes (OCR).
+    """
+    start = 0
+    while True:
+        end = text.find('\n\n', start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 2
 
 
 def pdf_to_word(pdf_path: str, output_path: str = None, use_ocr: bool = False, clean_special_chars: bool = True) -> str:
@@ -42,7 +51,10 @@ def pdf_to_word(pdf_path: str, output_path: str = None, use_ocr: bool = False, c
     Raises:
         RuntimeError: Se dependências não estão instaladas
     """
-    if not docx:
+    # python-docx é importado só aqui (custo de importação só quando usado)
+    try:
+        from docx import Document
+    except ImportError:
         raise RuntimeError(
             "Dependência python-docx não encontrada. Instale: pip install python-docx"
         )
@@ -72,6 +84,10 @@ def pdf_to_word(pdf_path: str, output_path: str = None, use_ocr: bool = False, c
             except Exception as ocr_error:
                 logger.warning("OCR indisponível para %s: %s", pdf_path, ocr_error)
                 extraction_note = str(ocr_error)
+                try:
+                    from pdf2image.exceptions import PDFInfoNotInstalledError
+                except ImportError:
+                    PDFInfoNotInstalledError = None
                 if PDFInfoNotInstalledError and isinstance(ocr_error, PDFInfoNotInstalledError):
                     extraction_note = (
                         "Poppler não está instalado ou não está no PATH. "
@@ -115,13 +131,11 @@ def pdf_to_word(pdf_path: str, output_path: str = None, use_ocr: bool = False, c
         # Adicionar conteúdo
         if text.strip():
             # Dividir texto em parágrafos
-            paragraphs = text.split('\n\n')
-            
-            for para_text in paragraphs:
+            for para_text in _iter_paragraphs(text):
                 para_text = para_text.strip()
                 if para_text:
                     # Verificar se é um título (linha curta, sem pontuação final)
-                    if len(para_text) < 100 and not para_text.endswith(('.', '!', '?', ':')):
+                    if len(para_text) < 100 and para_text[-1] not in _SENTENCE_END:
                         doc.add_heading(para_text, level=1)
                     else:
                         doc.add_paragraph(para_text)
@@ -155,24 +169,33 @@ def batch_pdf_to_word(pdf_paths: list, output_dir: str, use_ocr: bool = False, c
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    converted_files = []
+    pdf_paths = [Path(p) for p in pdf_paths]
+    results = [None] * len(pdf_paths)
     
-    for pdf_path in pdf_paths:
-        try:
-            pdf_path = Path(pdf_path)
-            output_path = output_dir / f"{pdf_path.stem}.docx"
-            
-            result_path = pdf_to_word(
-                str(pdf_path),
-                str(output_path),
-                use_ocr=use_ocr,
-                clean_special_chars=clean_special_chars
-            )
-            
-            converted_files.append(result_path)
-            
-        except Exception as e:
-            logger.error(f"Erro convertendo {pdf_path}: {e}")
-            continue
+    def convert_args(pdf_path: Path):
+        return (str(pdf_path), str(output_dir / f"{pdf_path.stem}.docx"), use_ocr, clean_special_chars)
+    
+    if len(pdf_paths) < _MIN_FILES_FOR_POOL:
+        for i, pdf_path in enumerate(pdf_paths):
+            try:
+                results[i] = pdf_to_word(*convert_args(pdf_path))
+            except Exception as e:
+                logger.error(f"Erro convertendo {pdf_path}: {e}")
+    else:
+        # Cada PDF é independente. Com OCR, cada arquivo já usa várias threads
+        # (rasterização e tesseract por página), então usamos menos processos
+        # e repartimos as CPUs entre as threads de OCR de cada um.
+        cpus = os.cpu_count() or 1
+        workers = min(max(1, cpus // 2) if use_ocr else cpus, len(pdf_paths))
+        with ProcessPoolExecutor(max_workers=workers, initializer=set_page_workers,
+                                 initargs=(cpus // workers,)) as ex:
+            futures = {ex.submit(pdf_to_word, *convert_args(p)): i for i, p in enumerate(pdf_paths)}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                try:
+                    results[i] = fut.result()
+                except Exception as e:
+                    logger.error(f"Erro convertendo {pdf_paths[i]}: {e}")
     
-    return converted_files
\ No newline at end of file
+    # Mesma ordem da entrada; arquivos com erro são omitidos
+    return [r for r in results if r is not None]
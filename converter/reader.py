@@ -2,56 +2,186 @@
 
 Suporta: .txt, .pdf, .docx e tentativa de .doc (melhor esforço).
 Suporta OCR para PDFs escaneados.
-Dependências opcionais (pdfminer.six, python-docx, textract, pytesseract).
+Dependências opcionais (pdfminer.six, python-docx, textract, pytesseract),
+importadas só quando o tipo de arquivo correspondente é lido.
 """
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
+from typing import Callable, Dict, Tuple
+import codecs
+import hashlib
+import io
 import logging
 import os
+import stat
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
 
-try:
-    from pdfminer.high_level import extract_text as extract_text_from_pdf
-except Exception:
-    extract_text_from_pdf = None
+logger = logging.getLogger(__name__)
+
+# Extensões suportadas (minúsculas, com ponto)
+SUPPORTED_EXTS = frozenset({".txt", ".pdf", ".docx", ".doc"})
+
+# Bytes iniciais (no máximo) usados para detectar o encoding de arquivos .txt,
+# lidos em blocos até o detector ter certeza
+_SNIFF_BYTES = 64 * 1024
+_SNIFF_CHUNK = 8 * 1024
+# Tamanho dos blocos decodificados por vez ao ler .txt
+_DECODE_CHUNK = 1 << 20
+# BOMs UTF-32/UTF-16 (UTF-32 LE primeiro: começa com o BOM UTF-16 LE)
+_UNICODE_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# Cache LRU de encodings detectados: resumo (blake2b) dos bytes analisados -> encoding.
+# Arquivos com o mesmo início (ex.: vários exports do mesmo sistema) não
+# passam de novo pelo detector, que é bem mais lento que o hash.
+_ENCODING_CACHE_MAX_ENTRIES = 4096
+_encoding_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_encoding_cache_lock = threading.Lock()
+
+# Tags WordprocessingML usadas na leitura em streaming de .docx
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_BODY, _W_P, _W_R, _W_HYPERLINK = _W + "body", _W + "p", _W + "r", _W + "hyperlink"
+# Conteúdo de run com texto fixo (mesmas regras de Run.text do python-docx);
+# w:t e w:br são tratados à parte
+_W_RUN_CHARS = {_W + "tab": "\t", _W + "ptab": "\t", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+
+
+@lru_cache(maxsize=None)
+def _encoding_detectors():
+    """Importa (uma única vez) o detector de encoding disponível.
+
+    Retorna (UniversalDetector, detect): UniversalDetector incremental do
+    cchardet (C, mais rápido) ou do chardet (dependência padrão); sem eles,
+    `detect` do charset-normalizer, último recurso porque em textos curtos em
+    português costuma escolher windows-1250 no lugar de windows-1252.
+    """
+    try:
+        from cchardet import UniversalDetector
+        return UniversalDetector, None
+    except Exception:
+        pass
+    try:
+        from chardet import UniversalDetector
+        return UniversalDetector, None
+    except Exception:
+        pass
+    try:
+        from charset_normalizer import detect
+        return None, detect
+    except Exception:
+        return None, None
 
-try:
-    import docx
-except Exception:
-    docx = None
 
-try:
-    import textract
-except Exception:
-    textract = None
+def _sniff_encoding(data: bytes) -> str:
+    """Detecta o encoding de um conteúdo que não é UTF-8 pelos primeiros bytes.
 
-try:
-    import chardet
-except Exception:
-    chardet = None
+    Um BOM UTF-16/UTF-32 decide sem passar pelo detector. O resultado da
+    detecção fica em cache pelo hash dos bytes analisados. Sem detector
+    instalado (ou resultado inútil), usa latin-1, que decodifica qualquer
+    sequência de bytes.
+    """
+    head = data[:_SNIFF_BYTES]
+    for bom, bom_enc in _UNICODE_BOMS:
+        if head.startswith(bom):
+            return bom_enc
+
+    digest = hashlib.blake2b(head, digest_size=8).digest()
+    # extract_text roda em várias threads (GUI, pools): o LRU só é alterado
+    # sob o lock; a detecção fica fora dele
+    with _encoding_cache_lock:
+        enc = _encoding_cache.get(digest)
+        if enc is not None:
+            _encoding_cache.move_to_end(digest)
+            return enc
+
+    enc = _detect_encoding(head)
+    with _encoding_cache_lock:
+        _encoding_cache[digest] = enc
+        if len(_encoding_cache) > _ENCODING_CACHE_MAX_ENTRIES:
+            _encoding_cache.popitem(last=False)
+    return enc
+
+
+def _detect_encoding(head: bytes) -> str:
+    """Passa `head` ao detector em blocos de 8 KB, parando assim que ele tiver certeza."""
+    UniversalDetector, detect_encoding = _encoding_detectors()
+    enc = None
+    if UniversalDetector is not None:
+        detector = UniversalDetector()
+        for start in range(0, len(head), _SNIFF_CHUNK):
+            detector.feed(head[start:start + _SNIFF_CHUNK])
+            if detector.done:
+                break
+        detector.close()
+        enc = detector.result.get("encoding")
+    elif detect_encoding is not None:
+        enc = detect_encoding(head).get("encoding")
+    try:
+        # "ascii" indica só que o trecho inicial não tinha acentos
+        if enc and codecs.lookup(enc).name != "ascii":
+            return enc
+    except LookupError:
+        pass
+    return "latin-1"
 
-logger = logging.getLogger(__name__)
+
+def _decode_rest(f, first: str, decoder) -> str:
+    """Junta `first` ao restante do arquivo binário `f`, decodificado em blocos.
+
+    Os pedaços vão direto para um StringIO, sem lista intermediária.
+    """
+    out = io.StringIO(newline="")
+    out.write(first)
+    for chunk in iter(lambda: f.read(_DECODE_CHUNK), b""):
+        out.write(decoder.decode(chunk))
+    out.write(decoder.decode(b"", final=True))
+    return out.getvalue()
 
 
 def read_txt(path: Path) -> str:
     """Lê arquivo .txt tentando detectar encoding.
 
-    Retorna string com todo o texto (strip preservado).
+    Tenta UTF-8 (com ou sem BOM) primeiro, o caso mais comum e que não
+    precisa de detecção. Se o conteúdo não for UTF-8 válido, o encoding é
+    detectado pelos primeiros 64 KB, passados ao detector em blocos de 8 KB
+    até ele ter certeza. Arquivos maiores que 1 MB são decodificados em blocos
+    de 1 MB: os bytes do arquivo inteiro nunca ficam na memória, e o pico fica
+    em cerca de duas vezes o tamanho do texto (buffer + str final). O primeiro
+    bloco decide entre UTF-8 e detecção antes de ler o resto.
+    Quebras de linha são preservadas como estão no arquivo.
     """
-    # Tentar detectar encoding com chardet se disponível
-    if chardet:
-        with open(path, "rb") as f:
-            raw = f.read()
-        enc = chardet.detect(raw).get("encoding") or "utf-8"
+    with open(path, "rb") as f:
+        data = f.read(_DECODE_CHUNK)
+        if len(data) < _DECODE_CHUNK:
+            # Arquivo pequeno, já lido por inteiro: decodificar de uma vez
+            try:
+                return data.decode("utf-8-sig")
+            except UnicodeDecodeError:
+                return data.decode(_sniff_encoding(data), errors="replace")
+
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
         try:
-            return raw.decode(enc, errors="replace")
-        except Exception:
-            return raw.decode("utf-8", errors="replace")
-    # fallback
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-    except Exception:
-        with open(path, "r", encoding="latin-1", errors="replace") as f:
-            return f.read()
+            first = decoder.decode(data)
+        except UnicodeDecodeError:
+            first = None
+        if first is not None:
+            try:
+                return _decode_rest(f, first, decoder)
+            except UnicodeDecodeError:
+                # UTF-8 válido só no início: decodificar tudo de novo com o
+                # encoding detectado
+                pass
+
+        decoder = codecs.getincrementaldecoder(_sniff_encoding(data))("replace")
+        f.seek(len(data))
+        return _decode_rest(f, decoder.decode(data), decoder)
 
 
 def read_pdf(path: Path) -> str:
@@ -67,7 +197,9 @@ def read_pdf(path: Path) -> str:
         RuntimeError: Se pdfminer.six não estiver instalado
         Exception: Para outros erros durante extração
     """
-    if extract_text_from_pdf is None:
+    try:
+        from pdfminer.high_level import extract_text as extract_text_from_pdf
+    except Exception:
         raise RuntimeError(
             "Dependência pdfminer.six não encontrada.\n"
             "Instale com: pip install pdfminer.six"
@@ -80,9 +212,49 @@ def read_pdf(path: Path) -> str:
         raise RuntimeError(f"Falha ao processar PDF {path.name}: {e}") from e
 
 
+def _iter_docx_paragraphs(path: Path):
+    """Gera o texto de cada parágrafo do corpo de um .docx, lendo o XML em streaming.
+
+    Equivale a `[p.text for p in docx.Document(path).paragraphs]`: só
+    parágrafos diretos de w:body, com o texto dos runs (inclusive dentro de
+    hyperlinks). Os elementos já lidos são descartados, então a memória não
+    cresce com o tamanho do documento.
+    """
+    with zipfile.ZipFile(path) as z, z.open("word/document.xml") as f:
+        stack = []
+        body = None
+        parts = []
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                stack.append(elem.tag)
+                if elem.tag == _W_BODY:
+                    body = elem
+                continue
+            tag = stack.pop()
+            if stack and stack[-1] == _W_BODY:
+                # Fim de um filho direto do corpo (parágrafo, tabela...)
+                if tag == _W_P:
+                    yield "".join(parts)
+                    parts.clear()
+                body.clear()
+            elif stack and stack[-1] == _W_R and (
+                stack[-3:-1] == [_W_BODY, _W_P] or stack[-4:-1] == [_W_BODY, _W_P, _W_HYPERLINK]
+            ):
+                if tag == _W + "t":
+                    parts.append(elem.text or "")
+                elif tag == _W + "br":
+                    if elem.get(_W + "type", "textWrapping") == "textWrapping":
+                        parts.append("\n")
+                elif tag in _W_RUN_CHARS:
+                    parts.append(_W_RUN_CHARS[tag])
+
+
 def read_docx(path: Path) -> str:
     """Extrai texto de um arquivo DOCX.
 
+    Lê `word/document.xml` em streaming (ver `_iter_docx_paragraphs`); se o
+    pacote tiver outra estrutura, usa python-docx.
+
     Args:
         path: Caminho para o arquivo DOCX
 
@@ -90,17 +262,24 @@ def read_docx(path: Path) -> str:
         Texto extraído do documento
 
     Raises:
-        RuntimeError: Se python-docx não estiver instalado ou houver erro de leitura
+        RuntimeError: Se houver erro de leitura ou, quando necessário, python-docx
+            não estiver instalado
     """
-    if docx is None:
+    try:
+        return "\n\n".join(t for t in _iter_docx_paragraphs(path) if t and not t.isspace())
+    except (KeyError, zipfile.BadZipFile, ET.ParseError) as e:
+        logger.debug(f"Leitura em streaming de {path} falhou ({e}), usando python-docx")
+
+    try:
+        import docx
+    except Exception:
         raise RuntimeError(
             "Dependência python-docx não encontrada.\n"
             "Instale com: pip install python-docx"
         )
     try:
         doc = docx.Document(str(path))
-        paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-        return "\n\n".join(paragraphs)
+        return "\n\n".join(t for t in (p.text for p in doc.paragraphs) if t and not t.isspace())
     except Exception as e:
         logger.error(f"Erro ao extrair texto do DOCX {path}: {e}")
         raise RuntimeError(f"Falha ao processar DOCX {path.name}: {e}") from e
@@ -118,7 +297,9 @@ def read_doc_fallback(path: Path) -> str:
     Raises:
         RuntimeError: Se textract não estiver disponível ou falhar
     """
-    if textract is None:
+    try:
+        import textract
+    except Exception:
         raise RuntimeError(
             "Leitura de .doc não disponível.\n"
             "Instale textract e dependências do sistema para suportar arquivos .doc antigos.\n"
@@ -139,16 +320,61 @@ def read_doc_fallback(path: Path) -> str:
         ) from e
 
 
-def extract_text(path: str, use_ocr: bool = False, clean_special_chars: bool = True) -> str:
+def _read_pdf_ocr(path: Path, clean_special_chars: bool, force_ocr: bool = True) -> Tuple[str, bool]:
+    """Extrai texto de PDF com OCR (forçado, ou só se o PDF parecer escaneado).
+
+    Se o OCR falhar, usa `read_pdf`.
+
+    Returns:
+        (texto, degradado); degradado é True quando o OCR falhou e o texto
+        veio da extração normal
+    """
+    try:
+        from .ocr import extract_text_with_ocr
+        return extract_text_with_ocr(str(path), force_ocr=force_ocr, clean_special_chars=clean_special_chars), False
+    except ImportError:
+        logger.warning("Módulo OCR não disponível, usando extração normal")
+    except Exception as e:
+        logger.warning(f"OCR falhou para {path}: {e}, usando extração normal")
+    return read_pdf(path), True
+
+
+# Leitor de cada extensão suportada (PDF com OCR usa `_read_pdf_ocr`)
+_READERS: Dict[str, Callable[[Path], str]] = {
+    ".txt": read_txt,
+    ".pdf": read_pdf,
+    ".docx": read_docx,
+    ".doc": read_doc_fallback,
+}
+
+
+def extract_text(path: str, use_ocr: bool = False, clean_special_chars: bool = True,
+                 auto_ocr: bool = False) -> str:
     """Extrai texto do arquivo com base na extensão.
 
+    Mesmos argumentos e exceções de `extract_text_with_status`.
+
+    Returns:
+        Texto extraído do documento
+    """
+    return extract_text_with_status(path, use_ocr, clean_special_chars, auto_ocr)[0]
+
+
+def extract_text_with_status(path: str, use_ocr: bool = False, clean_special_chars: bool = True,
+                             auto_ocr: bool = False) -> Tuple[str, bool]:
+    """Extrai texto do arquivo e informa se o resultado é degradado.
+
     Args:
         path: Caminho para o arquivo
-        use_ocr: Se deve usar OCR para PDFs (força OCR ou detecta automaticamente)
+        use_ocr: Se deve forçar OCR em PDFs
         clean_special_chars: Se deve limpar caracteres especiais
+        auto_ocr: Se True (e sem `use_ocr`), PDFs passam por
+            `ocr.extract_text_with_ocr`, que usa OCR só nos PDFs que parecem
+            escaneados e limpa o texto dos demais (comportamento da CLI)
 
     Returns:
-        Texto extraído do documento
+        (texto, degradado): degradado é True quando o OCR falhou e o texto veio
+        da extração normal; esse texto não deve ser guardado em cache
 
     Raises:
         ValueError: Se a extensão do arquivo não for suportada
@@ -157,43 +383,30 @@ def extract_text(path: str, use_ocr: bool = False, clean_special_chars: bool = T
     """
     p = Path(path)
 
-    # Validar existência do arquivo
-    if not p.exists():
-        raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+    # Um único stat valida existência e tipo
+    try:
+        st = p.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Arquivo não encontrado: {path}") from None
 
-    if not p.is_file():
+    if not stat.S_ISREG(st.st_mode):
         raise ValueError(f"Caminho não é um arquivo: {path}")
 
     ext = p.suffix.lower()
     logger.info(f"Extraindo texto de {p.name} (tipo: {ext})")
 
+    degraded = False
     try:
-        if ext == ".txt":
-            text = read_txt(p)
-        elif ext == ".pdf":
-            if use_ocr:
-                # Usar OCR para PDFs
-                try:
-                    from .ocr import extract_text_with_ocr
-                    text = extract_text_with_ocr(str(path), force_ocr=True, clean_special_chars=clean_special_chars)
-                except ImportError:
-                    logger.warning("Módulo OCR não disponível, usando extração normal")
-                    text = read_pdf(p)
-                except Exception as e:
-                    logger.warning(f"OCR falhou para {path}: {e}, usando extração normal")
-                    text = read_pdf(p)
-            else:
-                text = read_pdf(p)
-        elif ext == ".docx":
-            text = read_docx(p)
-        elif ext == ".doc":
-            text = read_doc_fallback(p)
+        if ext == ".pdf" and (use_ocr or auto_ocr):
+            text, degraded = _read_pdf_ocr(p, clean_special_chars, force_ocr=use_ocr)
         else:
-            supported_formats = [".txt", ".pdf", ".docx", ".doc"]
-            raise ValueError(
-                f"Extensão não suportada: {ext}\n"
-                f"Formatos suportados: {', '.join(supported_formats)}"
-            )
+            read = _READERS.get(ext)
+            if read is None:
+                raise ValueError(
+                    f"Extensão não suportada: {ext}\n"
+                    f"Formatos suportados: {', '.join(sorted(SUPPORTED_EXTS))}"
+                )
+            text = read(p)
 
         # Aplicar limpeza de caracteres se solicitado
         if clean_special_chars and ext != ".pdf":  # PDF com OCR já aplica limpeza
@@ -204,7 +417,7 @@ def extract_text(path: str, use_ocr: bool = False, clean_special_chars: bool = T
                 pass  # Se módulo OCR não disponível, manter texto original
 
         logger.info(f"Texto extraído com sucesso: {len(text)} caracteres")
-        return text
+        return text, degraded
 
     except Exception as e:
         logger.error(f"Erro ao extrair texto de {path}: {e}")
@@ -212,4 +425,4 @@ def extract_text(path: str, use_ocr: bool = False, clean_special_chars: bool = T
 
 
 def is_supported(path: str) -> bool:
-    return Path(path).suffix.lower() in {".txt", ".pdf", ".docx", ".doc"}
+    return os.path.splitext(path)[1].lower() in SUPPORTED_EXTS
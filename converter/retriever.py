@@ -3,17 +3,149 @@
 Funções:
 - retrieve_top_chunks(out_dir, index_dir, query, top_k): retorna lista de dicionários
   com o texto e metadados dos chunks mais relevantes.
+
+O ranking de cada consulta (só as referências aos chunks, sem o texto) fica
+em `<index_dir>/query_cache/*.qcache`, para que a mesma consulta (inclusive em
+outro processo) não refaça o ranking enquanto o índice e os batches não mudarem.
 """
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import hashlib
 import logging
-from . import indexer
+import os
+import threading
+from . import _json, indexer
 
 logger = logging.getLogger(__name__)
 
+# Cache LRU dos documentos de cada batch JSON, mantido entre consultas. A chave
+# inclui mtime e tamanho, então batches regravados são relidos.
+_BATCH_CACHE_MAX_ENTRIES = 16
+_BATCH_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_batch_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_batch_cache_bytes = 0
+_batch_cache_lock = threading.Lock()
+
+# Máximo de threads lendo batches distintos de uma consulta ao mesmo tempo
+_READ_WORKERS = 8
+
+# Cache em disco do ranking de consultas (subpasta do índice); ao passar do
+# limite, os arquivos mais antigos são removidos. A extensão não é .json para
+# que as entradas não sejam tomadas por batches (ex.: convert_json_files
+# percorre a pasta de saída recursivamente)
+_QUERY_CACHE_DIR = "query_cache"
+_QUERY_CACHE_SUFFIX = ".qcache"
+_QUERY_CACHE_MAX_FILES = 256
+
+
+def _load_batch_documents(jf_path: Path) -> List[Dict[str, Any]]:
+    """Retorna a lista de documentos de um batch JSON, usando o cache LRU.
+
+    Pode ser chamada de várias threads: a leitura e o parse ficam fora do lock.
+    """
+    global _batch_cache_bytes
+    st = jf_path.stat()
+    key = (str(jf_path.resolve()), st.st_mtime_ns, st.st_size)
+    with _batch_cache_lock:
+        cached = _batch_cache.get(key)
+        if cached is not None:
+            _batch_cache.move_to_end(key)
+            return cached[1]
+
+    docs = _json.loads(jf_path.read_bytes()).get("documents", [])
+    if st.st_size <= _BATCH_CACHE_MAX_BYTES:
+        with _batch_cache_lock:
+            if key not in _batch_cache:
+                _batch_cache[key] = (st.st_size, docs)
+                _batch_cache_bytes += st.st_size
+            while (len(_batch_cache) > _BATCH_CACHE_MAX_ENTRIES
+                   or _batch_cache_bytes > _BATCH_CACHE_MAX_BYTES):
+                _, (size, _docs) = _batch_cache.popitem(last=False)
+                _batch_cache_bytes -= size
+    return docs
+
+
+def _load_batches(out_dir: Path, names: List[str]) -> Dict[str, Any]:
+    """Carrega os batches `names` (em paralelo se forem vários).
 
-def retrieve_top_chunks(out_dir: Path, index_dir: Path, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    Returns:
+        Dicionário nome -> lista de documentos, ou a exceção da leitura
+    """
+    def load(name: str):
+        try:
+            return _load_batch_documents(out_dir / name)
+        except Exception as e:
+            return e
+
+    if len(names) < 2:
+        return {name: load(name) for name in names}
+    with ThreadPoolExecutor(max_workers=min(_READ_WORKERS, len(names))) as ex:
+        return dict(zip(names, ex.map(load, names)))
+
+
+def _query_cache_path(out_dir: Path, index_dir: Path, query: str, top_k: int) -> Optional[Path]:
+    """Caminho do resultado em cache da consulta, ou None se o índice não existe.
+
+    A chave inclui os mtimes dos arquivos do índice: reconstruir o índice
+    invalida todas as consultas anteriores.
+    """
+    try:
+        mtimes = [(index_dir / name).stat().st_mtime_ns for name in indexer._INDEX_FILES]
+    except OSError:
+        return None
+    key = _json.dumps([query, top_k, str(out_dir.resolve()), mtimes])
+    return index_dir / _QUERY_CACHE_DIR / f"{hashlib.sha1(key).hexdigest()}{_QUERY_CACHE_SUFFIX}"
+
+
+def _batch_stats(out_dir: Path, names: List[str]) -> Dict[str, List[int]]:
+    stats = {}
+    for name in names:
+        st = (out_dir / name).stat()
+        stats[name] = [st.st_mtime_ns, st.st_size]
+    return stats
+
+
+def _read_cached_refs(cache_path: Path, out_dir: Path) -> Optional[List[Dict[str, Any]]]:
+    """Referências em cache, se existirem e os batches usados não tiverem mudado."""
+    try:
+        entry = _json.loads(cache_path.read_bytes())
+        if _batch_stats(out_dir, list(entry["batches"])) != entry["batches"]:
+            return None
+        return entry["refs"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_cached_refs(cache_path: Path, out_dir: Path, names: List[str],
+                       refs: List[Dict[str, Any]]) -> None:
+    """Grava o ranking da consulta (escrita atômica) e limita o tamanho do cache.
+
+    Só as referências (`json_file`, `doc_pos`, `score`) são gravadas; o texto
+    dos chunks é relido dos batches, o que mantém as entradas pequenas.
+    """
+    try:
+        cache_path.parent.mkdir(exist_ok=True)
+        refs = [{"json_file": r.get("json_file"), "doc_pos": r.get("doc_pos"), "score": r.get("score", 0.0)}
+                for r in refs]
+        entry = {"batches": _batch_stats(out_dir, names), "refs": refs}
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(_json.dumps(entry))
+        os.replace(tmp_path, cache_path)
+
+        with os.scandir(cache_path.parent) as it:
+            entries = [e for e in it if e.name.endswith(_QUERY_CACHE_SUFFIX)]
+        if len(entries) > _QUERY_CACHE_MAX_FILES:
+            entries.sort(key=lambda e: e.stat().st_mtime_ns)
+            for e in entries[:len(entries) - _QUERY_CACHE_MAX_FILES]:
+                os.unlink(e.path)
+    except OSError as e:
+        logger.warning(f"Falha ao gravar cache da consulta em {cache_path.parent}: {e}")
+
+
+def retrieve_top_chunks(out_dir: Path, index_dir: Path, query: str, top_k: int = 5,
+                        use_cache: bool = True) -> List[Dict[str, Any]]:
     """
     Consulta o índice TF-IDF, recupera os chunks mais relevantes e retorna seu conteúdo.
 
@@ -22,6 +154,7 @@ def retrieve_top_chunks(out_dir: Path, index_dir: Path, query: str, top_k: int =
         index_dir: O diretório onde o índice TF-IDF foi salvo.
         query: A string de busca.
         top_k: O número de chunks a retornar.
+        use_cache: Se deve usar (e gravar) o cache de consultas em `index_dir`.
 
     Returns:
         Uma lista de dicionários, cada um contendo o texto e metadados do chunk.
@@ -29,21 +162,31 @@ def retrieve_top_chunks(out_dir: Path, index_dir: Path, query: str, top_k: int =
     out_dir = Path(out_dir)
     index_dir = Path(index_dir)
 
-    # 1. Consultar o índice para obter as referências dos chunks mais relevantes
-    try:
-        ranked_refs = indexer.query_index(index_dir, query, top_k)
-    except Exception as e:
-        logger.error(f"Falha ao consultar o índice em {index_dir}: {e}")
-        return []
+    cache_path = _query_cache_path(out_dir, index_dir, query, top_k) if use_cache else None
+    ranked_refs = _read_cached_refs(cache_path, out_dir) if cache_path is not None else None
+    if ranked_refs is not None:
+        logger.info(f"Ranking da consulta obtido do cache ({len(ranked_refs)} chunks)")
+        # Já está no cache; não precisa regravar
+        cache_path = None
+    else:
+        # 1. Consultar o índice para obter as referências dos chunks mais relevantes
+        try:
+            ranked_refs = indexer.query_index(index_dir, query, top_k)
+        except Exception as e:
+            logger.error(f"Falha ao consultar o índice em {index_dir}: {e}")
+            return []
 
     if not ranked_refs:
         return []
 
     # 2. Carregar o texto dos chunks a partir dos arquivos JSON
     results: List[Dict[str, Any]] = []
-    
-    # Cache para evitar reabrir o mesmo arquivo JSON várias vezes
-    json_cache: Dict[str, Dict] = {}
+    # Resultados parciais (batch ausente ou inválido) não vão para o cache
+    complete = True
+
+    # Batches distintos são lidos de uma vez (cache LRU ou disco)
+    names = list(dict.fromkeys(ref["json_file"] for ref in ranked_refs if ref.get("json_file")))
+    batches = _load_batches(out_dir, names)
 
     for ref in ranked_refs:
         json_filename = ref.get("json_file")
@@ -51,15 +194,9 @@ def retrieve_top_chunks(out_dir: Path, index_dir: Path, query: str, top_k: int =
             continue
 
         try:
-            # Carregar o batch JSON do cache ou do disco
-            if json_filename not in json_cache:
-                jf_path = out_dir / json_filename
-                with open(jf_path, "r", encoding="utf-8") as f:
-                    json_cache[json_filename] = json.load(f)
-            
-            batch = json_cache[json_filename]
-            
-            docs = batch.get("documents", [])
+            docs = batches[json_filename]
+            if isinstance(docs, Exception):
+                raise docs
             doc_pos = int(ref.get("doc_pos", -1))
 
             if 0 <= doc_pos < len(docs):
@@ -75,11 +212,17 @@ def retrieve_top_chunks(out_dir: Path, index_dir: Path, query: str, top_k: int =
                     "score": ref.get("score", 0.0),
                 })
             else:
+                complete = False
                 logger.warning(f"Posição de documento inválida {doc_pos} para o arquivo {json_filename}")
 
         except FileNotFoundError:
+            complete = False
             logger.warning(f"Arquivo JSON referenciado pelo índice não encontrado: {json_filename}")
         except Exception as e:
+            complete = False
             logger.warning(f"Falha ao processar referência para {json_filename}: {e}")
 
+    if cache_path is not None and complete:
+        _write_cached_refs(cache_path, out_dir, names, ranked_refs)
+
     return results
@@ -6,6 +6,7 @@ Uso exemplo:
 """
 import argparse
 import logging
+import multiprocessing
 import os
 from pathlib import Path
 import sys
@@ -13,65 +14,52 @@ import sys
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from converter import reader, chunker
-from converter import ocr as conv_ocr
+# Um thread OpenMP por tesseract: o paralelismo vem de várias páginas e arquivos
+# ao mesmo tempo. Herdado pelos subprocessos; defina a variável para mudar.
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+from converter import chunker, file_utils
 from converter import output_formats
 from converter import pdf_to_word
 
 
 def collect_candidates(inputs, recursive: bool):
-    candidates = []
-    for p in inputs:
-        pth = Path(p)
-        if pth.is_dir():
-            if recursive:
-                for fp in pth.rglob("*"):
-                    if fp.is_file() and reader.is_supported(str(fp)):
-                        candidates.append(str(fp))
-            else:
-                for fp in pth.iterdir():
-                    if fp.is_file() and reader.is_supported(str(fp)):
-                        candidates.append(str(fp))
-        elif pth.is_file():
-            if reader.is_supported(str(pth)):
-                candidates.append(str(pth))
-    return candidates
-
-
-def process_files(candidates, out_dir, max_bytes, force_ocr=False, clean_special_chars=True):
-    docs = []
-    total = len(candidates)
-    for i, fp in enumerate(candidates, 1):
-        try:
-            logger.info(f"Lendo ({i}/{total}): {fp}")
-            suffix = Path(fp).suffix.lower()
-            if suffix == '.pdf':
-                text = conv_ocr.extract_text_with_ocr(fp, force_ocr=force_ocr, clean_special_chars=clean_special_chars)
-            else:
-                text = reader.extract_text(fp)
-                if clean_special_chars:
-                    text = conv_ocr.clean_text(text)
-        except Exception as e:
-            logger.exception("Erro lendo %s: %s", fp, e)
-            continue
-        docs.append({
-            "source_path": str(fp),
-            "filename": Path(fp).name,
-            "filetype": Path(fp).suffix.lower().lstrip('.'),
-            "text": text,
-        })
+    return file_utils.collect_files(inputs, recursive)
+
+
+def process_files(candidates, out_dir, max_bytes, force_ocr=False, clean_special_chars=True, use_cache=True):
+    def report(done, total, fp):
+        logger.info(f"Lido ({done}/{total}): {fp}")
+
+    # Documentos gerados um a um: o chunker grava cada batch sem esperar a
+    # extração de todos os arquivos. PDFs escaneados passam por OCR mesmo sem
+    # --force-ocr (auto_ocr)
+    docs = file_utils.iter_docs(
+        candidates,
+        use_ocr=force_ocr,
+        clean_special_chars=clean_special_chars,
+        progress_callback=report,
+        cache_dir=str(Path(out_dir) / file_utils.EXTRACT_CACHE_DIR) if use_cache else None,
+        auto_ocr=True,
+    )
     # Write JSON chunks
     return chunker.chunk_and_write(docs, Path(out_dir), max_bytes)
 
 
 def parse_args(argv=None):
-    parser = argparse.ArgumentParser(description="CLI para conversor de documentos")
+    parser = argparse.ArgumentParser(
+        description="CLI para conversor de documentos",
+        epilog="O OCR roda o tesseract com OMP_THREAD_LIMIT=1 por padrão; "
+               "defina OMP_THREAD_LIMIT no ambiente para usar mais threads por página.",
+    )
     parser.add_argument('--inputs', '-i', nargs='*', help='Arquivos ou pastas de entrada (padrão: cwd)')
     parser.add_argument('--outdir', '-o', default=str(Path.cwd() / 'output_jsons'), help='Pasta de saída para JSONs')
     parser.add_argument('--max-mb', type=int, default=50, help='Tamanho máximo por JSON em MB')
     parser.add_argument('--recursive', action='store_true', help='Pesquisar pastas recursivamente')
     parser.add_argument('--force-ocr', action='store_true', help='Forçar OCR em PDFs')
     parser.add_argument('--no-clean', dest='clean', action='store_false', help='Não limpar caracteres especiais')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help=f'Não reaproveitar textos já extraídos (cache em <outdir>/{file_utils.EXTRACT_CACHE_DIR})')
     parser.add_argument('--json-to', choices=['txt', 'pdf'], help='Converter JSONs gerados para TXT ou PDF')
     parser.add_argument('--output-converted-dir', default=None, help='Diretório para arquivos convertidos (JSON->TXT/PDF)')
     parser.add_argument('--pdf-to-word', dest='pdf_to_word', action='store_true', help='Converter PDFs para DOCX (batch)')
@@ -99,7 +87,7 @@ def main(argv=None):
         return
 
     logger.info(f"Processando {len(candidates)} arquivos. Saida em: {args.outdir}")
-    json_files = process_files(candidates, args.outdir, args.max_mb * 1024 * 1024, force_ocr=args.force_ocr, clean_special_chars=args.clean)
+    json_files = process_files(candidates, args.outdir, args.max_mb * 1024 * 1024, force_ocr=args.force_ocr, clean_special_chars=args.clean, use_cache=args.use_cache)
 
     # Conversão adicional: JSON -> txt/pdf
     if args.json_to:
@@ -108,4 +96,6 @@ def main(argv=None):
 
 
 if __name__ == '__main__':
+    # Necessário para o pool de processos da extração em executáveis congelados (Windows)
+    multiprocessing.freeze_support()
     main()
@@ -15,11 +15,22 @@ import threading
 import os
 import sys
 import logging
-from converter import reader, chunker, indexer
+import multiprocessing
+
+# Um thread OpenMP por tesseract: o paralelismo vem de várias páginas e arquivos
+# ao mesmo tempo. Herdado pelos subprocessos; defina a variável para mudar.
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+from converter import chunker, indexer, file_utils
 
-logging.basicConfig(level=logging.INFO, filename='gui_debug.log', filemode='w', format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Itens de listas (entradas, candidatos) mostrados no log de depuração
+_LOG_PREVIEW_ITEMS = 10
+
+# Intervalo (ms) em que as mensagens de progresso pendentes são aplicadas aos rótulos
+_PROGRESS_INTERVAL_MS = 50
+
 
 class EnhancedApp:
     def __init__(self, root):
@@ -47,6 +58,14 @@ class EnhancedApp:
         self.setup_output_tab()
 
         self.files = []
+        # Espelho de self.files para checar duplicatas em O(1)
+        self._files_set = set()
+
+        # Progresso enviado pelas threads de trabalho: guarda só a mensagem mais
+        # recente de cada rótulo, aplicada periodicamente pelo loop do Tk
+        self._progress_lock = threading.Lock()
+        self._pending_progress = {}
+        self.root.after(_PROGRESS_INTERVAL_MS, self._drain_progress)
 
     def setup_main_tab(self):
         """Configura a aba principal de conversão para JSON"""
@@ -93,6 +112,9 @@ class EnhancedApp:
         self.clean_chars_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(options_frame, text="Limpar caracteres especiais", variable=self.clean_chars_var).pack(anchor=tk.W, padx=5, pady=2)
 
+        self.use_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Reaproveitar textos já extraídos (cache na pasta de saída)", variable=self.use_cache_var).pack(anchor=tk.W, padx=5, pady=2)
+
         # Formatos de saída
         output_formats_frame = ttk.LabelFrame(frm, text="Formatos de Saída Adicionais")
         output_formats_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -157,6 +179,8 @@ class EnhancedApp:
         ttk.Button(frm, text="Converter para Word", command=self.start_pdf_to_word).pack(pady=10)
 
         self.pdf_files = []
+        # Espelho de self.pdf_files para checar duplicatas em O(1)
+        self._pdf_files_set = set()
 
     def setup_output_tab(self):
         """Configura a aba de conversão de formatos de saída"""
@@ -203,19 +227,26 @@ class EnhancedApp:
     def select_files(self):
         paths = filedialog.askopenfilenames(title="Selecionar arquivos", filetypes=[
             ("Documentos", "*.txt *.pdf *.docx *.doc"), ("Todos", "*.*")])
+        new_paths = []
         for p in paths:
-            if p not in self.files:
-                self.files.append(p)
-                self.listbox.insert("end", p)
+            if p not in self._files_set:
+                self._files_set.add(p)
+                new_paths.append(p)
+        if new_paths:
+            # Uma única inserção no Listbox para toda a seleção
+            self.files.extend(new_paths)
+            self.listbox.insert("end", *new_paths)
 
     def select_folder(self):
         folder = filedialog.askdirectory(title="Selecionar pasta")
-        if folder:
+        if folder and folder not in self._files_set:
+            self._files_set.add(folder)
             self.listbox.insert("end", folder)
             self.files.append(folder)
 
     def clear_files(self):
         self.files.clear()
+        self._files_set.clear()
         self.listbox.delete(0, tk.END)
 
     def select_output(self):
@@ -227,13 +258,18 @@ class EnhancedApp:
     def select_pdf_files(self):
         paths = filedialog.askopenfilenames(title="Selecionar PDFs", filetypes=[
             ("PDF", "*.pdf"), ("Todos", "*.*")])
+        new_paths = []
         for p in paths:
-            if p not in self.pdf_files:
-                self.pdf_files.append(p)
-                self.pdf_listbox.insert("end", p)
+            if p not in self._pdf_files_set:
+                self._pdf_files_set.add(p)
+                new_paths.append(p)
+        if new_paths:
+            self.pdf_files.extend(new_paths)
+            self.pdf_listbox.insert("end", *new_paths)
 
     def clear_pdf_files(self):
         self.pdf_files.clear()
+        self._pdf_files_set.clear()
         self.pdf_listbox.delete(0, tk.END)
 
     def select_pdf_output(self):
@@ -269,10 +305,10 @@ class EnhancedApp:
 
         # run in background
         t = threading.Thread(target=self.run_conversion, args=(
-            list(self.files), out_dir, int(max_mb * 1024 * 1024), 
+            tuple(self.files), out_dir, int(max_mb * 1024 * 1024), 
             self.recursive_var.get(), self.use_ocr_var.get(), 
             self.clean_chars_var.get(), self.output_txt_var.get(), 
-            self.output_pdf_var.get()
+            self.output_pdf_var.get(), self.use_cache_var.get()
         ))
         t.start()
 
@@ -287,7 +323,7 @@ class EnhancedApp:
             return
 
         t = threading.Thread(target=self.run_pdf_to_word, args=(
-            list(self.pdf_files), out_dir, 
+            tuple(self.pdf_files), out_dir, 
             self.pdf_use_ocr_var.get(), self.pdf_clean_chars_var.get()
         ))
         t.start()
@@ -310,78 +346,67 @@ class EnhancedApp:
         ))
         t.start()
 
-    def run_conversion(self, inputs, out_dir, max_bytes, recursive, use_ocr, clean_chars, output_txt, output_pdf):
+    def run_conversion(self, inputs, out_dir, max_bytes, recursive, use_ocr, clean_chars, output_txt, output_pdf, use_cache=True):
         self.set_progress("Iniciando...")
-        logger.info(f"Inputs: {inputs}")
-        logger.info(f"Out dir: {out_dir}")
-        logger.info(f"Max bytes: {max_bytes}")
-        logger.info(f"Recursive: {recursive}")
-        logger.info(f"Use OCR: {use_ocr}")
-        logger.info(f"Clean chars: {clean_chars}")
+        # Formatação %-style: os argumentos só viram texto se o nível estiver
+        # ativo, e listas grandes não são despejadas inteiras no log
+        logger.info("Inputs: %d item(s)", len(inputs))
+        logger.debug("Inputs: %s", inputs[:_LOG_PREVIEW_ITEMS])
+        logger.info("Out dir: %s", out_dir)
+        logger.info("Max bytes: %d", max_bytes)
+        logger.info("Recursive: %s", recursive)
+        logger.info("Use OCR: %s", use_ocr)
+        logger.info("Clean chars: %s", clean_chars)
         # gather file list
-        candidates = []
-        for p in inputs:
-            pth = Path(p)
-            logger.info(f"Checking path: {p} -> {pth}")
-            if pth.is_dir():
-                logger.info(f"{p} is dir, recursive={recursive}")
-                if recursive:
-                    for fp in pth.rglob("*"):
-                        if fp.is_file() and reader.is_supported(str(fp)):
-                            candidates.append(str(fp))
-                            logger.info(f"Added file: {fp}")
-                else:
-                    for fp in pth.iterdir():
-                        if fp.is_file() and reader.is_supported(str(fp)):
-                            candidates.append(str(fp))
-                            logger.info(f"Added file: {fp}")
-            elif pth.is_file():
-                if reader.is_supported(str(pth)):
-                    candidates.append(str(pth))
-                    logger.info(f"Added file: {pth}")
-
-        logger.info(f"Candidates found: {candidates}")
+        candidates = file_utils.collect_files(inputs, recursive)
+
+        logger.info("Candidates found: %d file(s)", len(candidates))
+        logger.debug("First candidates: %s", candidates[:_LOG_PREVIEW_ITEMS])
         if not candidates:
             self.set_progress("Nenhum arquivo suportado encontrado.")
             return
 
-        docs = []
+        def report(done, total, fp):
+            self.set_progress(f"Lido ({done}/{total}): {fp}")
+
         errors = []
-        total = len(candidates)
-        for i, fp in enumerate(candidates, 1):
-            try:
-                self.set_progress(f"Lendo ({i}/{total}): {fp}")
-                logger.info(f"Reading file: {fp}")
-                text = reader.extract_text(fp, use_ocr=use_ocr, clean_special_chars=clean_chars)
-                logger.info(f"Text length: {len(text)}")
-            except Exception as e:
-                logger.exception("Erro lendo %s", fp)
-                errors.append(f"{Path(fp).name}: {e}")
-                continue
-            docs.append({
-                "source_path": str(fp),
-                "filename": Path(fp).name,
-                "filetype": Path(fp).suffix.lower().lstrip('.'),
-                "text": text,
-            })
-
-        logger.info(f"Docs prepared: {len(docs)}")
-        if not docs:
-            self.set_progress("Nenhum documento foi processado com sucesso.")
-            error_msg = "Nenhum documento foi processado. Verifique os arquivos e configurações de OCR."
-            if errors:
-                joined = "\n".join(errors[:5])
-                error_msg += f"\n\nFalhas detectadas:\n{joined}"
-                if len(errors) > 5:
-                    error_msg += "\n..."
-            messagebox.showerror("Erro", error_msg)
-            return
+        doc_count = 0
+
+        def counted(docs):
+            # Conta os documentos à medida que o chunker os consome
+            nonlocal doc_count
+            for doc in docs:
+                doc_count += 1
+                yield doc
+
+        # Documentos extraídos vão direto para o chunker, sem manter todos os
+        # textos na memória
+        docs = file_utils.iter_docs(
+            candidates,
+            use_ocr=use_ocr,
+            clean_special_chars=clean_chars,
+            progress_callback=report,
+            errors=errors,
+            cache_dir=str(Path(out_dir) / file_utils.EXTRACT_CACHE_DIR) if use_cache else None,
+        )
 
-            self.set_progress("Gerando JSONs...")
         try:
             # O parâmetro embed_index não é mais necessário com o índice TF-IDF global.
-            json_files = chunker.chunk_and_write(docs, Path(out_dir), max_bytes, embed_index=False)
-            logger.info(f"JSONs written to {out_dir}: {json_files}")
+            json_files = chunker.chunk_and_write(counted(docs), Path(out_dir), max_bytes, embed_index=False)
+
+            logger.info("Docs prepared: %d", doc_count)
+            if not doc_count:
+                self.set_progress("Nenhum documento foi processado com sucesso.")
+                error_msg = "Nenhum documento foi processado. Verifique os arquivos e configurações de OCR."
+                if errors:
+                    joined = "\n".join(errors[:5])
+                    error_msg += f"\n\nFalhas detectadas:\n{joined}"
+                    if len(errors) > 5:
+                        error_msg += "\n..."
+                messagebox.showerror("Erro", error_msg)
+                return
+
+            logger.info("JSONs written to %s: %d file(s)", out_dir, len(json_files))
             summary_lines = [f"{len(json_files)} arquivo(s) JSON gerados em {out_dir}"]
 
             # Gerar índice TF-IDF global apenas se o checkbox estiver marcado
@@ -392,9 +417,9 @@ class EnhancedApp:
                     index_dir = indexer.build_index(Path(out_dir), [Path(f).name for f in json_files])
                     if index_dir:
                         summary_lines.append(f"Índice TF-IDF global gerado em: {index_dir.name}")
-                        logger.info(f"Índice TF-IDF criado em {index_dir}")
+                        logger.info("Índice TF-IDF criado em %s", index_dir)
                 except Exception as e:
-                    logger.warning(f"Falha ao gerar índice TF-IDF: {e}")
+                    logger.warning("Falha ao gerar índice TF-IDF: %s", e)
                     summary_lines.append(f"Falha ao gerar índice: {e}")
             
             # Gerar formatos adicionais se solicitado
@@ -496,27 +521,37 @@ class EnhancedApp:
             messagebox.showerror("Erro", f"Erro durante conversão: {e}")
             self.set_convert_progress("Erro")
 
+    def _post_progress(self, label, text):
+        with self._progress_lock:
+            self._pending_progress[label] = text
+
+    def _drain_progress(self):
+        with self._progress_lock:
+            pending, self._pending_progress = self._pending_progress, {}
+        for label, text in pending.items():
+            label.config(text=text)
+        self.root.after(_PROGRESS_INTERVAL_MS, self._drain_progress)
+
     def set_progress(self, text):
-        def upd():
-            self.progress.config(text=text)
-        self.root.after(0, upd)
+        self._post_progress(self.progress, text)
 
     def set_pdf_progress(self, text):
-        def upd():
-            self.pdf_progress.config(text=text)
-        self.root.after(0, upd)
+        self._post_progress(self.pdf_progress, text)
 
     def set_convert_progress(self, text):
-        def upd():
-            self.convert_progress.config(text=text)
-        self.root.after(0, upd)
+        self._post_progress(self.convert_progress, text)
 
 
 def main():
+    # Configurado aqui (e não no import) para que os processos de extração,
+    # que reimportam este módulo no Windows, não truncem o log
+    logging.basicConfig(level=logging.INFO, filename='gui_debug.log', filemode='w', format='%(asctime)s - %(levelname)s - %(message)s')
     root = tk.Tk()
     app = EnhancedApp(root)
     root.mainloop()
 
 
 if __name__ == '__main__':
+    # Necessário para o pool de processos da extração em executáveis congelados (Windows)
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -1,6 +1,8 @@
 import json
 from pathlib import Path
 
+import pytest
+
 from converter import chunker
 
 
@@ -16,5 +18,47 @@ def test_chunk_and_write_with_index(tmp_path):
     p = Path(files[0])
     data = json.loads(p.read_text(encoding='utf-8'))
     assert 'local_index' in data
-    # termo básico deve aparecer
-    assert 'mundo' in data['local_index']
+    index = data['local_index']
+    # termo básico deve aparecer, apontando para as referências dos dois documentos
+    postings = index['postings']['mundo']
+    assert [index['refs'][pos]['filename'] for pos, _ in postings] == ['a.txt', 'b.txt']
+    assert all(freq == 1 for _, freq in postings)
+
+
+def test_chunk_and_write_splits_large_document(tmp_path):
+    text = "Ação \"citada\"\n€ " * 2000
+    docs = [{"filename": "grande.txt", "text": text}]
+
+    files = chunker.chunk_and_write(docs, tmp_path, max_size_bytes=4096)
+    assert len(files) > 1
+
+    parts = []
+    for f in files:
+        p = Path(f)
+        assert p.stat().st_size <= 4096
+        parts.extend(json.loads(p.read_text(encoding='utf-8'))['documents'])
+    parts.sort(key=lambda d: d['chunk_index'])
+    # Nenhum caractere cortado ou perdido na divisão por bytes
+    assert "".join(d['text'] for d in parts) == text
+
+
+def test_chunk_and_write_removes_incomplete_batch(tmp_path):
+    def docs():
+        yield {"filename": "a.txt", "text": "primeiro documento"}
+        raise RuntimeError("falha na extração")
+
+    with pytest.raises(RuntimeError):
+        chunker.chunk_and_write(docs(), tmp_path, max_size_bytes=4096)
+    assert not list(tmp_path.glob("*.json"))
+
+
+def test_chunk_and_write_counts_control_char_escapes(tmp_path):
+    from converter import _json
+    text = "início\x01\x1f\b\f\t\x7f fim"
+    assert chunker._json_value_bytes(text) == len(_json.dumps(text))
+
+    docs = [{"filename": "controle.txt", "text": "a\x01" * 3000}]
+    docs += [{"filename": f"{i}.txt", "text": "b\x02c" * 150} for i in range(20)]
+    files = chunker.chunk_and_write(docs, tmp_path, max_size_bytes=4096)
+    for f in files:
+        assert Path(f).stat().st_size <= 4096
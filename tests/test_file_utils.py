@@ -0,0 +1,100 @@
+from converter import file_utils
+
+
+def test_collect_files_directory_recursive(tmp_path):
+    (tmp_path / "a.txt").write_text("a", encoding="utf-8")
+    (tmp_path / "ignorar.xyz").write_text("x", encoding="utf-8")
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    (sub / "b.txt").write_text("b", encoding="utf-8")
+
+    assert len(file_utils.collect_files([str(tmp_path)], recursive=True)) == 2
+    assert len(file_utils.collect_files([str(tmp_path)], recursive=False)) == 1
+
+    files = file_utils.iter_files([str(tmp_path)], recursive=True)
+    assert next(files).endswith("a.txt")
+    assert [f.endswith("b.txt") for f in files] == [True]
+
+
+def test_process_files_to_docs_with_callback(tmp_path):
+    paths = []
+    for i in range(3):
+        p = tmp_path / f"doc_{i}.txt"
+        p.write_text(f"Documento {i}", encoding="utf-8")
+        paths.append(str(p))
+    paths.append(str(tmp_path / "inexistente.txt"))
+
+    calls = []
+    errors = []
+    docs = file_utils.process_files_to_docs(
+        paths, progress_callback=lambda done, total, fp: calls.append((done, total)), errors=errors
+    )
+
+    # Ordem de entrada preservada, arquivo com erro omitido
+    assert [d["filename"] for d in docs] == ["doc_0.txt", "doc_1.txt", "doc_2.txt"]
+    assert docs[1]["text"] == "Documento 1"
+    assert len(errors) == 1 and "inexistente.txt" in errors[0]
+    assert sorted(calls) == [(i, 4) for i in range(1, 5)]
+
+
+def test_iter_docs_keeps_order_with_bounded_window(tmp_path):
+    paths = []
+    for i in range(12):
+        p = tmp_path / f"doc_{i:02d}.txt"
+        p.write_text(f"Documento {i}", encoding="utf-8")
+        paths.append(str(p))
+
+    docs = file_utils.iter_docs(paths, max_workers=2)
+    assert [d["text"] for d in docs] == [f"Documento {i}" for i in range(12)]
+
+
+def test_process_files_to_docs_reuses_extract_cache(tmp_path):
+    src = tmp_path / "doc.txt"
+    src.write_text("Texto original", encoding="utf-8")
+    cache_dir = tmp_path / "cache"
+
+    docs = file_utils.process_files_to_docs([str(src)], cache_dir=str(cache_dir))
+    assert docs[0]["text"] == "Texto original"
+    entries = list(cache_dir.iterdir())
+    assert len(entries) == 1
+
+    # Mesmo conteúdo: o texto vem do cache, sem nova extração
+    entries[0].write_bytes("Texto do cache".encode("utf-8"))
+    docs = file_utils.process_files_to_docs([str(src)], cache_dir=str(cache_dir))
+    assert docs[0]["text"] == "Texto do cache"
+
+
+def test_extract_cache_skips_failed_ocr_fallback(tmp_path, monkeypatch):
+    from converter import ocr, reader
+    pdf = tmp_path / "escaneado.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(reader, "read_pdf", lambda p: "")
+    monkeypatch.setitem(reader._READERS, ".pdf", reader.read_pdf)
+
+    def ocr_quebrado(p, clean):
+        raise RuntimeError("tesseract indisponível")
+
+    # OCR falhou: o texto da extração normal não vai para o cache
+    monkeypatch.setattr(ocr, "ocr_pdf", ocr_quebrado)
+    docs = file_utils.process_files_to_docs([str(pdf)], cache_dir=str(cache_dir), auto_ocr=True)
+    assert docs[0]["text"] == ""
+    assert not cache_dir.exists() or not list(cache_dir.iterdir())
+
+    # Com o OCR de volta, a próxima execução extrai de novo
+    monkeypatch.setattr(ocr, "ocr_pdf", lambda p, clean: "texto do OCR")
+    docs = file_utils.process_files_to_docs([str(pdf)], cache_dir=str(cache_dir), auto_ocr=True)
+    assert docs[0]["text"] == "texto do OCR"
+    assert len(list(cache_dir.iterdir())) == 1
+
+
+def test_extract_cache_prune_removes_least_recently_used(tmp_path):
+    import os
+    from converter import _cache
+    for i, name in enumerate(("antiga", "usada", "nova")):
+        _cache.put(tmp_path, name, "x" * 100)
+        os.utime(tmp_path / f"{name}.cache", ns=(i * 10**9, i * 10**9))
+    assert _cache.get(tmp_path, "antiga") == "x" * 100  # leitura renova a entrada
+
+    _cache.prune(tmp_path, max_bytes=200)
+    assert sorted(p.stem for p in tmp_path.iterdir()) == ["antiga", "nova"]
@@ -12,11 +12,10 @@ DOCS_SAMPLE = [
     {"text": "O processamento de linguagem natural é um campo da inteligência artificial."}
 ]
 
-@pytest.fixture
-def temp_output_dir(tmp_path):
-    """Cria um diretório de saída temporário para os testes."""
-    output_dir = tmp_path / "test_output"
-    output_dir.mkdir()
+@pytest.fixture(scope="module")
+def temp_output_dir(tmp_path_factory):
+    """Cria (uma vez por módulo) um diretório de saída temporário para os testes."""
+    output_dir = tmp_path_factory.mktemp("test_output")
     
     # Criar arquivos JSON de amostra
     json_files = []
@@ -41,6 +40,14 @@ def temp_output_dir(tmp_path):
     # Limpeza
     shutil.rmtree(output_dir)
 
+
+@pytest.fixture(scope="module")
+def built_index(temp_output_dir):
+    """Índice construído uma única vez e compartilhado pelos testes de consulta."""
+    output_dir, json_files = temp_output_dir
+    return indexer.build_index(output_dir, json_files)
+
+
 def test_build_tfidf_index(temp_output_dir):
     """Testa se a construção do índice TF-IDF cria os arquivos esperados."""
     output_dir, json_files = temp_output_dir
@@ -57,10 +64,9 @@ def test_build_tfidf_index(temp_output_dir):
     assert len(metadata) == len(DOCS_SAMPLE)
     assert metadata[0]["filename"] == "doc_0.txt"
 
-def test_query_tfidf_index(temp_output_dir):
+def test_query_tfidf_index(built_index):
     """Testa a consulta ao índice TF-IDF."""
-    output_dir, json_files = temp_output_dir
-    index_dir = indexer.build_index(output_dir, json_files)
+    index_dir = built_index
     
     # Query que deve ter alta similaridade com os documentos 2 e 3
     query = "inteligência artificial e linguagem"
@@ -84,12 +90,35 @@ def test_query_tfidf_index(temp_output_dir):
     assert "json_file" in first_result
     assert "doc_pos" in first_result
 
-def test_query_with_no_match(temp_output_dir):
+def test_query_with_no_match(built_index):
     """Testa uma consulta que não deve encontrar resultados."""
-    output_dir, json_files = temp_output_dir
-    index_dir = indexer.build_index(output_dir, json_files)
+    index_dir = built_index
     
     query = "termo inexistente xyz"
     results = indexer.query_index(index_dir, query, top_k=5)
     
     assert len(results) == 0
+
+def test_query_reuses_cached_index(built_index):
+    """Consultas repetidas usam o índice em cache sem alterar os metadados."""
+    index_dir = built_index
+
+    first = indexer.query_index(index_dir, "cão preguiçoso", top_k=2)
+    second = indexer.query_index(index_dir, "inteligência artificial", top_k=2)
+
+    assert first and second
+    assert {r["filename"] for r in second} == {"doc_2.txt", "doc_3.txt"}
+    _, _, metadata = indexer._load_index(index_dir)
+    assert all("score" not in m for m in metadata)
+
+def test_query_index_written_by_joblib(temp_output_dir, tmp_path):
+    """Índices antigos, com o vectorizer gravado por joblib.dump, continuam legíveis."""
+    import joblib
+    output_dir, json_files = temp_output_dir
+    index_dir = tmp_path / "indice"
+    shutil.copytree(indexer.build_index(output_dir, json_files), index_dir)
+    vectorizer = indexer._load_vectorizer(index_dir / "tfidf_vectorizer.joblib")
+    joblib.dump(vectorizer, index_dir / "tfidf_vectorizer.joblib")
+
+    results = indexer.query_index(index_dir, "inteligência artificial", top_k=2)
+    assert {r["filename"] for r in results} == {"doc_2.txt", "doc_3.txt"}
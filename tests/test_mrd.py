@@ -21,3 +21,31 @@ def test_json_to_mrd(tmp_path):
     assert 'local_index' in data
     assert 'mrd_version' in data
     assert data['documents'][0]['filename'] == 'a.txt'
+    index = data['local_index']
+    assert index['refs'][0]['filename'] == 'a.txt'
+    assert index['postings']['mundo'] == [[0, 1]]
+
+
+def test_convert_json_files_parallel_keeps_order(tmp_path):
+    json_files = []
+    for i in range(4):
+        p = tmp_path / f"batch_{i:04d}.json"
+        batch = {"batch_id": str(i), "documents": [{"filename": f"{i}.txt", "text": f"texto {i}"}]}
+        p.write_text(json.dumps(batch), encoding='utf-8')
+        json_files.append(str(p))
+
+    for fmt in ('txt', 'mrd'):
+        out = output_formats.convert_json_files(str(tmp_path), fmt, str(tmp_path / fmt), json_files=json_files)
+        assert [Path(p).stem for p in out] == [f"batch_{i:04d}" for i in range(4)]
+
+
+def test_convert_json_files_discovers_nested_json(tmp_path):
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    batch = {"documents": [{"filename": "a.txt", "text": "texto"}]}
+    (tmp_path / "a.json").write_text(json.dumps(batch), encoding='utf-8')
+    (sub / "b.json").write_text(json.dumps(batch), encoding='utf-8')
+    (sub / "ignorar.txt").write_text("x", encoding='utf-8')
+
+    out = output_formats.convert_json_files(str(tmp_path), 'txt', str(tmp_path / "out"))
+    assert sorted(Path(p).name for p in out) == ["a.txt", "b.txt"]
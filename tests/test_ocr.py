@@ -0,0 +1,26 @@
+import pytest
+
+from converter import ocr
+
+
+@pytest.mark.parametrize("page_workers, expected", [
+    (1, [(1, 8), (9, 16), (17, 20)]),
+    (4, [(1, 5), (6, 10), (11, 15), (16, 20)]),
+])
+def test_ocr_pdf_groups_follow_page_workers(monkeypatch, page_workers, expected):
+    pdf2image = pytest.importorskip("pdf2image")
+    pytest.importorskip("pytesseract")
+    rendered = []
+
+    def convert(path, dpi, first_page, last_page):
+        rendered.append((first_page, last_page))
+        return [f"página {n}" for n in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(pdf2image, "pdfinfo_from_path", lambda path: {"Pages": 20})
+    monkeypatch.setattr(pdf2image, "convert_from_path", convert)
+    monkeypatch.setattr(ocr, "_ocr_pages", lambda pytesseract, images: list(images))
+    monkeypatch.setattr(ocr, "_page_workers", page_workers)
+
+    text = ocr.ocr_pdf("doc.pdf", clean_special_chars=False)
+    assert sorted(rendered) == expected
+    assert text.index("página 1") < text.index("página 20")
@@ -1,9 +1,98 @@
 from converter import reader
 from pathlib import Path
 
+import pytest
+
 
 def test_read_txt(tmp_path):
     p = tmp_path / "sample.txt"
     p.write_text("Olá mundo\nLinha 2\n")
     text = reader.extract_text(str(p))
     assert "Olá mundo" in text
+
+
+def test_read_txt_latin1(tmp_path):
+    p = tmp_path / "latin1.txt"
+    p.write_bytes("Ação e coração não são informação.\r\n".encode("latin-1"))
+    text = reader.read_txt(p)
+    assert text == "Ação e coração não são informação.\r\n"
+
+
+def test_read_txt_utf8_bom(tmp_path):
+    p = tmp_path / "bom.txt"
+    p.write_bytes("﻿Olá".encode("utf-8"))
+    assert reader.read_txt(p) == "Olá"
+
+
+def test_extract_text_rereads_changed_file(tmp_path):
+    p = tmp_path / "doc.txt"
+    p.write_text("primeira versão", encoding="utf-8")
+    assert reader.extract_text(str(p)) == "primeira versão"
+    assert reader.extract_text(str(p)) == "primeira versão"
+
+    p.write_text("segunda versão, mais longa", encoding="utf-8")
+    assert reader.extract_text(str(p)) == "segunda versão, mais longa"
+
+
+def test_read_docx_matches_python_docx(tmp_path):
+    docx = pytest.importorskip("docx")
+    d = docx.Document()
+    p = d.add_paragraph("Olá\tmundo ")
+    p.add_run("quebra").add_break()
+    p.add_run("linha")
+    d.add_paragraph("   ")
+    d.add_table(rows=1, cols=1).cell(0, 0).text = "na tabela"
+    d.add_paragraph("depois da tabela")
+    path = tmp_path / "doc.docx"
+    d.save(path)
+
+    expected = "\n\n".join(p.text for p in docx.Document(str(path)).paragraphs if p.text.strip())
+    assert reader.read_docx(path) == expected
+
+
+def test_read_txt_utf16_bom(tmp_path):
+    p = tmp_path / "utf16.txt"
+    p.write_bytes("Olá, informação".encode("utf-16"))
+    assert reader.read_txt(p) == "Olá, informação"
+
+
+def test_read_txt_encoding_detection_cached(tmp_path, monkeypatch):
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    for p in (a, b):
+        p.write_bytes("Ação e coração não são informação.\n".encode("latin-1"))
+    assert reader.read_txt(a) == "Ação e coração não são informação.\n"
+
+    def fail(head):
+        raise AssertionError("encoding deveria vir do cache")
+
+    monkeypatch.setattr(reader, "_detect_encoding", fail)
+    assert reader.read_txt(b) == "Ação e coração não são informação.\n"
+
+
+def test_read_txt_decodes_large_file_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(reader, "_DECODE_CHUNK", 7)
+    text = "Ação\r\ncoração €\n" * 5
+    utf8, latin1 = tmp_path / "utf8.txt", tmp_path / "latin1.txt"
+    utf8.write_bytes(text.encode("utf-8"))
+    latin1.write_bytes(text.replace("€", "e").encode("latin-1"))
+    assert reader.read_txt(utf8) == text
+    assert reader.read_txt(latin1) == text.replace("€", "e")
+
+    # Primeiro bloco UTF-8 válido (ASCII), acentos latin-1 só depois
+    late = tmp_path / "late.txt"
+    late.write_bytes("abcdefghij Ação\r\n".encode("latin-1"))
+    assert reader.read_txt(late) == "abcdefghij Ação\r\n"
+
+
+def test_extract_text_pdf_auto_ocr(tmp_path, monkeypatch):
+    from converter import ocr
+    pdf = tmp_path / "escaneado.pdf"
+    pdf.write_bytes(b"%PDF-1.4")
+    monkeypatch.setattr(reader, "read_pdf", lambda p: "  ")
+    monkeypatch.setitem(reader._READERS, ".pdf", reader.read_pdf)
+    monkeypatch.setattr(ocr, "ocr_pdf", lambda p, clean: "texto do OCR")
+
+    # Sem auto_ocr (GUI): texto do PDF sem OCR nem limpeza
+    assert reader.extract_text(str(pdf)) == "  "
+    # Com auto_ocr (CLI): PDF escaneado detectado e passado ao OCR
+    assert reader.extract_text(str(pdf), auto_ocr=True) == "texto do OCR"
@@ -24,3 +24,34 @@ def test_retrieve_top_chunks(tmp_path):
     assert isinstance(results, list)
     assert len(results) >= 1
     assert any(r.get("filename") in {"a.txt", "b.txt"} for r in results)
+
+
+def test_retrieve_rereads_rewritten_batch(tmp_path):
+    batch = {"documents": [{"filename": "a.txt", "chunk_index": 0, "text": "mundo antigo", "char_count": 12}]}
+    jf = tmp_path / "output_0001.json"
+    jf.write_text(json.dumps(batch), encoding="utf-8")
+    idx_path = indexer.build_index(tmp_path, [jf.name])
+    assert retriever.retrieve_top_chunks(tmp_path, idx_path, "mundo")[0]["text"] == "mundo antigo"
+
+    batch["documents"][0]["text"] = "mundo reescrito, novo"
+    jf.write_text(json.dumps(batch), encoding="utf-8")
+    assert retriever.retrieve_top_chunks(tmp_path, idx_path, "mundo")[0]["text"] == "mundo reescrito, novo"
+
+
+def test_retrieve_uses_query_cache(tmp_path, monkeypatch):
+    batch = {"documents": [{"filename": "a.txt", "chunk_index": 0, "text": "mundo em cache", "char_count": 14}]}
+    jf = tmp_path / "output_0001.json"
+    jf.write_text(json.dumps(batch), encoding="utf-8")
+    idx_path = indexer.build_index(tmp_path, [jf.name])
+    first = retriever.retrieve_top_chunks(tmp_path, idx_path, "mundo")
+    entries = list((Path(idx_path) / "query_cache").glob("*.qcache"))
+    assert entries
+    assert not list(tmp_path.rglob("query_cache/*.json"))
+    # Só o ranking vai para o cache; o texto é relido do batch
+    assert b"mundo em cache" not in entries[0].read_bytes()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("consulta deveria vir do cache")
+
+    monkeypatch.setattr(indexer, "query_index", fail)
+    assert retriever.retrieve_top_chunks(tmp_path, idx_path, "mundo") == first